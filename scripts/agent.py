@@ -2,21 +2,158 @@
 This script holds the agent class and functionality for the agent to solve the puzzle.
 """
 
+import logging
 import math
+import time
 from random import randint
-from state import GameState
+from state import GameState, ScoreStates
+from arena import SearchTree
+from cache import TranspositionTable
+from expectimax import ExpectimaxSearch, CanSearch
+from parallel import ParallelSearch, GetEngine
+from rollout import RolloutSearch
+from searchstats import SearchStats
 
+import bitboard
+import heuristics
+import searchstats
 import numpy as np
 
+# The deepest the iterative search goes, however much time is left.
+MAX_ITERATIVE_DEPTH = 32
+# The shallowest search the arena tree is used for. Below it building the arrays costs
+# more than the GameState objects it saves: 1.12 ms against 0.55 ms a move at depth 3,
+# while at depth 5 the arena takes 1.71 ms against 1.98 ms.
+ARENA_MIN_DEPTH = 5
+
+
+def CreateAgent(config: dict):
+    """
+    Creates an agent with the search settings in the configuration.
+
+    Args:
+        config: The configuration dict.
+
+    Returns:
+        The Agent.
+    """
+
+    return Agent(
+        config['maxdepth'],
+        lazy=config['lazy'],
+        arena=config['arena'],
+        tableSize=config['transpositiontable'],
+        heuristic=config['heuristic'],
+        symmetricKeys=config['symmetrickeys'],
+        expectimax=config['expectimax'],
+        probabilityThreshold=config['probabilitythreshold'],
+        expectimaxBudget=config['expectimaxbudget'],
+        timeBudget=config['timebudget'],
+        workers=config['workers'],
+        splitDepth=config['splitdepth'],
+        playouts=config['playouts'],
+        horizon=config['rollouthorizon'],
+        policy=config['rolloutpolicy'],
+        seed=config['seed'],
+        depthPolicy=config['depthpolicy'] if config['adaptivedepth'] else None
+    )
+
 
 class Agent:
-    def __init__(self, maxDepth: int) -> None:
+    def __init__(
+        self,
+        maxDepth: int,
+        lazy: bool = False,
+        arena: bool = False,
+        tableSize: int = 0,
+        heuristic: str = 'DifferenceInLog2',
+        symmetricKeys: bool = False,
+        expectimax: bool = False,
+        probabilityThreshold: float = 0.0001,
+        expectimaxBudget: float = 400,
+        timeBudget: float = 0,
+        workers: int = 0,
+        splitDepth: int = 1,
+        playouts: int = 0,
+        horizon: int = 10,
+        policy: str = 'random',
+        seed: int = None,
+        depthPolicy: dict = None) -> None:
         self.__gameState: GameState = None
+        self.__searchTree: SearchTree = None
+        # The expectimax or rollout search of the current turn.
+        self.__moveSearch: object = None
+        # The score of each root move found by the iterative or parallel search.
+        self.__rootScores: dict = None
+        self.__deadline: float = None
+        # The smallest leaf score below each state already searched in a tree built up front.
+        self.__bestScores: dict = {}
         self.maxDepth = maxDepth
+        # The name of the heuristic in heuristics.py used to score the leaves.
+        self.heuristic = heuristic
+        # If True, the tree is expanded depth first on demand instead of built up front.
+        self.lazy = lazy
+        # If True, 4x4 boards are searched with the flat array tree in arena.py when the
+        # search is at least ARENA_MIN_DEPTH deep.
+        self.arena = arena
+        # If True, the spawned tiles are modelled as chance nodes and the agent picks the
+        # move with the smallest expected score. Chance branches less likely than
+        # probabilityThreshold are scored instead of searched.
+        self.expectimax = expectimax
+        self.probabilityThreshold = probabilityThreshold
+        # If above 0, the expectimax search is deepened a move at a time up to maxDepth
+        # until this many milliseconds have passed. At depth 3 an unbounded search takes
+        # 0.21s a move on average but up to 1.26s on boards with many empty tiles.
+        self.expectimaxBudget = expectimaxBudget
+        # If above 0, the search is deepened a ply at a time until this many milliseconds
+        # have passed, and maxDepth is ignored.
+        self.timeBudget = timeBudget
+        # The depth the last search completed.
+        self.reachedDepth = 0
+        # If above 1, the subtrees below the boards splitDepth moves from the root are
+        # searched in this many worker processes. The pool is kept for every turn.
+        self.parallelSearch = ParallelSearch(workers, splitDepth, heuristic, tableSize) if workers > 1 else None
+        # If above 0, the agent plays this many Monte Carlo rollouts of horizon moves from
+        # each root move instead of searching the tree. The policy picks the rollout moves.
+        self.playouts = playouts
+        self.horizon = horizon
+        self.policy = policy
+        self.rng = np.random.default_rng(seed)
+        # If set, the search depth is chosen each turn from the board with ChooseDepth and
+        # maxDepth is ignored.
+        self.depthPolicy = depthPolicy
+        # The search stats of the last call to GetNextMove and of every call so far.
+        self.lastStats = SearchStats()
+        self.totalStats = SearchStats()
+        # Transposition tables, used if tableSize is above 0. Heuristic scores only depend on
+        # the board so they are kept between turns, search results are cleared every turn.
+        # Symmetries of a 4x4 board share an entry if the heuristic scores them all the same.
+        canonical = symmetricKeys and heuristics.IsSymmetric(heuristic)
+        self.scoreTable = TranspositionTable(tableSize, canonical) if tableSize > 0 else None
+        self.searchTable = TranspositionTable(tableSize, canonical) if tableSize > 0 else None
 
     def GetNextMove(self, tileNumberList: list, moveToRemove: int = None) -> int:
         """
-        Gets the best possible move.
+        Gets the best possible move, recording the work done in lastStats and totalStats.
+        
+        Args:
+            tileNumberList: A list of the read tile values.
+            moveToRemove: A number representing the move to remove.
+            
+        Returns:
+            A number representing the next move to take.
+        """
+
+        self.lastStats = SearchStats()
+        try:
+            with searchstats.Recording(self.lastStats):
+                return self.SearchNextMove(tileNumberList, moveToRemove)
+        finally:
+            self.totalStats.Add(self.lastStats)
+
+    def SearchNextMove(self, tileNumberList: list, moveToRemove: int = None) -> int:
+        """
+        Searches for the best possible move with the search the agent is configured for.
         
         Args:
             tileNumberList: A list of the read tile values.
@@ -27,92 +164,306 @@ class Agent:
         """
 
         array = np.array(tileNumberList)
+        if moveToRemove is None:
+            if self.depthPolicy is not None:
+                self.maxDepth = self.ChooseDepth(array)
+            self.reachedDepth = self.maxDepth
+            self.__rootScores = None
         if moveToRemove is not None:
+            if self.__moveSearch is not None:
+                self.__moveSearch.RemoveChild(moveToRemove)
+                return self.__moveSearch.FindBestMove()
+            if self.__rootScores is not None:
+                self.__rootScores.pop(moveToRemove, None)
+                return self.GetBestRootMove()
+            if self.__searchTree is not None:
+                self.__searchTree.RemoveChild(moveToRemove)
+                return self.__searchTree.FindBestMove()
             self.__gameState.RemoveChild(moveToRemove)
+        elif self.expectimax and CanSearch(array):
+            self.__gameState = None
+            self.__searchTree = None
+            # Expected scores depend on the probability of reaching a board, so they are
+            # only valid for the turn they were found in.
+            if self.searchTable is not None: self.searchTable.Clear()
+            self.__moveSearch = ExpectimaxSearch(
+                array,
+                self.maxDepth,
+                probabilityThreshold=self.probabilityThreshold,
+                table=self.searchTable,
+                heuristic=self.heuristic,
+                timeBudget=self.expectimaxBudget
+            )
+            bestMove = self.__moveSearch.FindBestMove()
+            self.reachedDepth = self.__moveSearch.reachedDepth
+            return bestMove
+        elif self.playouts > 0:
+            self.__gameState = None
+            self.__searchTree = None
+            self.__moveSearch = RolloutSearch(
+                array,
+                self.playouts,
+                self.horizon,
+                policy=self.policy,
+                heuristic=self.heuristic,
+                rng=self.rng
+            )
+            return self.__moveSearch.FindBestMove()
+        elif self.timeBudget > 0:
+            self.__searchTree = None
+            self.__moveSearch = None
+            if self.searchTable is not None: self.searchTable.Clear()
+            return self.FindBestMoveIteratively(array)
+        elif self.parallelSearch is not None and GetEngine(array) is not None:
+            self.__searchTree = None
+            self.__moveSearch = None
+            # A lazy root, so GetArrayOfNextMove can generate the child of the move made.
+            self.__gameState = GameState(array, self.maxDepth, lazy=True, heuristic=self.heuristic)
+            self.__rootScores = self.parallelSearch.ScoreRootMoves(array, self.maxDepth, GetEngine(array))
+            return self.GetBestRootMove()
+        elif self.arena and self.maxDepth >= ARENA_MIN_DEPTH and bitboard.CanEncode(array):
+            self.__gameState = None
+            self.__moveSearch = None
+            self.__searchTree = SearchTree(bitboard.EncodeBoard(array), self.maxDepth, heuristic=self.heuristic)
+            return self.__searchTree.FindBestMove()
         else:
-            self.__gameState = GameState(array, self.maxDepth)
+            self.__searchTree = None
+            self.__moveSearch = None
+            # Lazy trees cache search results rather than sharing states so they stay small.
+            table = None
+            if self.searchTable is not None:
+                self.searchTable.Clear()
+                if not self.lazy: table = self.searchTable
+            startTime = time.perf_counter()
+            self.__gameState = GameState(
+                array,
+                self.maxDepth,
+                lazy=self.lazy,
+                table=table,
+                heuristic=self.heuristic
+            )
+            # Lazy states record their own expansion time as they are generated.
+            if not self.lazy:
+                self.lastStats.expansionTime += time.perf_counter() - startTime
         nextMove = self.FindBestMove()
         return nextMove
 
-    def FindBestMove(self):
+    def ChooseDepth(self, array: np.array) -> int:
         """
-        Search through the game states tree to find the best possible next move.
-        
+        Chooses the search depth for a board from the depth policy. Each empty tile
+        threshold the board is at or below adds a ply, as does having at least the
+        distinct tile threshold of different tile values.
+
+        Args:
+            array: The board read from the game.
+
         Returns:
-            The best next move.
-        """
-        # Find best score
-        score = self.GetBestChildStateScore(smallest=True)
-        # If best score is -1, there are no more possible moves.
-        if score == -1 or score == math.inf:
-            return -1
-
-        # Find path to the best score
-        path = self.FindPath(score, self.__gameState)
-
-        # If path is None, an Error has occured in finding the best score
-        if path is None:
-            raise ValueError("Best Score calculated but could not be found.")
-
-        # Find the next move to make to get to the best score.
-        for move, child in enumerate(self.__gameState.children):
-            if child is None: continue
-            if child is path[1]:
-                return move
-        raise ValueError("Next move could not be found.")
-        
-    def GetBestChildStateScore(self, smallest: bool = False) -> int:
+            The search depth, between the policy's minimum and maximum depth.
         """
-        Searches through the game state tree to find the leaf with the best score.
-        
-        Args:
-            smallest: True if the impliementer wants to find the smallest value in the tree.
 
+        emptyCount = np.count_nonzero(array == 0)
+        distinctCount = len(np.unique(array[array > 0]))
+        depth = self.depthPolicy['mindepth']
+        depth += sum(emptyCount <= threshold for threshold in self.depthPolicy['emptythresholds'])
+        if distinctCount >= self.depthPolicy['distinctthreshold']:
+            depth += 1
+        return int(min(depth, self.depthPolicy['maxdepth']))
+
+    def FindBestMove(self) -> int:
+        """
+        Searches the game state tree depth first, carrying the smallest leaf score below
+        each state back up so the best move is found in a single pass. Lazy states are
+        generated only when they are reached. The leaves of a tree built up front are all
+        scored with one batched call before the search.
+        
         Returns:
-            The highest Score.
+            The best next move or -1 if there are no moves.
         """
 
-        bestScore = math.inf if smallest else -1
+        self.__bestScores = {}
+        if not self.__gameState.lazy:
+            self.ScoreLeaves()
+        bestScore = math.inf
+        bestMove = -1
+        for move, child in self.__gameState.IterateChildren():
+            score = self.GetBestLeafScore(child)
+            # Equal scores keep the first move, the same leaf a depth first search reaches first.
+            if score < bestScore:
+                bestScore = score
+                bestMove = move
+        self.__bestScores = {}
+        return bestMove
+
+    def ScoreLeaves(self) -> None:
+        """
+        Walks the tree built up front a level at a time and scores all of its leaves with
+        one batched heuristic call. Scoring the leaves inside the depth first search would
+        batch at most 4 siblings at a time, which is slower than this extra walk.
+        """
+
+        leaves = []
+        visited = set()
         frontier = [self.__gameState]
         while frontier:
-            state = frontier.pop(0)
-            if state is None: continue
-            if hasattr(state, 'children'):
-                frontier.extend(state.children)
-            else:
-                if smallest:
-                    if state.score <= bestScore:
-                        bestScore = state.score
-                else:
-                    if state.score >= bestScore:
-                        bestScore = state.score
-        return bestScore
+            nextFrontier = []
+            for state in frontier:
+                # States shared through the table can be reached more than once.
+                if state is None or id(state) in visited: continue
+                visited.add(id(state))
+                if hasattr(state, 'children'):
+                    nextFrontier.extend(state.children)
+                elif state.IsLeaf():
+                    leaves.append(state)
+            frontier = nextFrontier
+        ScoreStates(leaves, self.scoreTable)
 
-    def FindPath(self, score: int, state: object) -> any:
+    def FindBestMoveIteratively(self, array: np.array) -> int:
         """
-        Finds the path to the leaf with the given score.
+        Searches one ply deeper at a time until the time budget runs out. Each depth
+        searches the root moves in the order of their scores at the depth before.
 
         Args:
-            score: The score to be found.
-            state: The game state to search.
+            array: The board read from the game.
+
+        Returns:
+            The best next move at the last completed depth.
+        """
+
+        deadline = time.perf_counter() + self.timeBudget / 1000
+        moveOrder = [0, 1, 2, 3]
+        self.reachedDepth = 0
+        for depth in range(1, MAX_ITERATIVE_DEPTH + 1):
+            gameState = GameState(array, depth, lazy=True, heuristic=self.heuristic)
+            try:
+                # The first depth always completes so there is a move to make.
+                rootScores = self.ScoreRootMoves(gameState, moveOrder, deadline if depth > 1 else None)
+            except TimeoutError:
+                break
+            self.__gameState = gameState
+            self.__rootScores = rootScores
+            self.reachedDepth = depth
+            if not rootScores or time.perf_counter() >= deadline: break
+            moveOrder = sorted(rootScores, key=rootScores.get)
+        logging.debug(f"Searched to depth {self.reachedDepth}.")
+        return self.GetBestRootMove()
+
+    def ScoreRootMoves(self, gameState: GameState, moveOrder: list, deadline: float = None) -> dict:
+        """
+        Finds the smallest leaf score below each root move.
+
+        Args:
+            gameState: The lazy root state.
+            moveOrder: The order to search the moves in.
+            deadline: The time.perf_counter() value to stop searching at.
+
+        Returns:
+            A dict of the score of each move that changes the board, in search order.
+
+        Raises:
+            TimeoutError: If the deadline passes before the search completes.
+        """
+
+        self.__deadline = deadline
+        try:
+            rootScores = {}
+            for move in moveOrder:
+                child = gameState.GetChild(move)
+                if child is None: continue
+                rootScores[move] = self.GetBestLeafScore(child)
+            return rootScores
+        finally:
+            self.__deadline = None
+
+    def GetBestRootMove(self) -> int:
+        """
+        Gets the root move with the smallest score found by the iterative search.
 
         Returns:
-            The path to the goal state or None value.
+            The best next move or -1 if there are no moves.
         """
 
-        if state is None: return None
+        bestScore = math.inf
+        bestMove = -1
+        for move, score in self.__rootScores.items():
+            if score < bestScore:
+                bestScore = score
+                bestMove = move
+        return bestMove
+
+    def GetSubtreeScore(self, array: np.array, depth: int) -> float:
+        """
+        Finds the smallest leaf score below a board, searching the tree lazily.
+
+        Args:
+            array: The board as a 2D-array of tile values.
+            depth: The number of moves to search below the board.
+
+        Returns:
+            The smallest leaf score or infinity if there are no leaves.
+        """
+
+        return self.GetBestLeafScore(GameState(array, depth, lazy=True, heuristic=self.heuristic))
+
+    def GetBestLeafScore(self, state: GameState) -> float:
+        """
+        Finds the smallest leaf score below the given state.
         
-        if hasattr(state, 'children'):
-            for child in state.children:
-                path = self.FindPath(score, state=child)
-                if path != None:
-                    return [state] + path
-            return None
-        else:
-            if state.score == score:
-                return [state]
-            else:
-                return None
+        Args:
+            state: The game state to search.
+            
+        Returns:
+            The smallest leaf score or infinity if there are no leaves.
+        """
+
+        if state.IsLeaf():
+            if not state.HasScore(): ScoreStates([state], self.scoreTable)
+            return state.score
+        if self.__deadline is not None and time.perf_counter() >= self.__deadline:
+            raise TimeoutError("The search ran out of time.")
+        # States shared through the table in a tree built up front are searched once. The
+        # table already holds those states, so their scores are kept by object instead.
+        useTable = self.searchTable is not None and state.lazy
+        if not state.lazy:
+            bestScore = self.__bestScores.get(id(state))
+            if bestScore is not None: return bestScore
+        elif useTable:
+            # Keyed by the plies left to search so results carry over between depths.
+            key = (state.GetKey(self.searchTable), state.maxDepth - state.depth)
+            bestScore = self.searchTable.Get(key)
+            if bestScore is not None: return bestScore
+        children = [child for _, child in state.IterateChildren()]
+        # Lazy siblings on the last level are scored together. They are never more than 4,
+        # so ScoreStates scores them one by one, which is faster than a batch that small.
+        if state.lazy and children and children[0].IsLeaf():
+            ScoreStates(children, self.scoreTable)
+        bestScore = min((self.GetBestLeafScore(child) for child in children), default=math.inf)
+        if not state.lazy:
+            self.__bestScores[id(state)] = bestScore
+        elif useTable:
+            self.searchTable.Put(key, bestScore)
+        return bestScore
+
+    def GetCacheStats(self) -> dict:
+        """
+        Gets the hit and miss counts of the transposition tables, counted over every turn.
+
+        Returns:
+            A dict of the counters of each table, or an empty dict if the tables are disabled.
+        """
+
+        if self.scoreTable is None: return {}
+        return {
+            'score': self.scoreTable.GetStats(),
+            'search': self.searchTable.GetStats()
+        }
+
+    def Close(self) -> None:
+        """
+        Stops the worker processes of the parallel search.
+        """
+
+        if self.parallelSearch is not None:
+            self.parallelSearch.Shutdown()
 
     def GetArrayOfNextMove(self, move: int) -> object:
         """
@@ -125,4 +476,8 @@ class Agent:
             The array made from performing the given move.
         """
 
-        return self.__gameState.children[move].array
\ No newline at end of file
+        if self.__moveSearch is not None:
+            return self.__moveSearch.GetChildArray(move)
+        if self.__searchTree is not None:
+            return bitboard.DecodeBoard(self.__searchTree.GetChildBoard(move))
+        return self.__gameState.GetChild(move).array
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+Description:
+    - Holds the search tree in flat NumPy arrays instead of one GameState object per node.
+    - Nodes are integer indices into the arrays of packed boards, parent indices, moves,
+      depths and scores.
+    - Expands the tree a level at a time with the vectorized bitboard move tables.
+"""
+
+import math
+import time
+
+import numpy as np
+
+import bitboard
+import heuristics
+import searchstats
+
+# The average number of moves which change a board, used to size the node arrays. It is
+# between 2 and 3 past the first move on the benchmark boards, and the arrays grow if needed.
+BRANCHING_FACTOR = 3
+
+
+def EstimateCapacity(maxDepth: int) -> int:
+    """
+    Estimates the number of nodes in a tree from its depth and the branching factor.
+
+    Args:
+        maxDepth: The depth of the tree.
+
+    Returns:
+        The number of nodes to allocate.
+    """
+
+    return (BRANCHING_FACTOR ** (maxDepth + 1) - 1) // (BRANCHING_FACTOR - 1)
+
+
+class SearchTree:
+    """
+    Class to represent a game state tree stored in preallocated flat arrays.
+
+    Node 0 is the root. The children of every level are stored after the level above,
+    ordered by parent and then by move, so scanning a level visits the nodes in the same
+    order as a depth first search of the tree.
+    """
+
+    def __init__(
+        self,
+        board: int,
+        maxDepth: int,
+        capacity: int = None,
+        heuristic: str = 'DifferenceInLog2') -> None:
+        if capacity is None: capacity = EstimateCapacity(maxDepth)
+        self.maxDepth = maxDepth
+        self.heuristic = heuristic
+        self.size = 0
+        self.boards = np.zeros(capacity, dtype=np.uint64)
+        self.parents = np.zeros(capacity, dtype=np.int32)
+        self.moves = np.zeros(capacity, dtype=np.int8)
+        self.depths = np.zeros(capacity, dtype=np.int8)
+        self.scores = np.full(capacity, np.nan)
+        # Index range of each level of the tree.
+        self.levels = []
+        self.removedMoves = set()
+        self.AddNodes(np.array([board], dtype=np.uint64), np.array([-1]), np.array([-1]), 0)
+        self.Expand()
+
+    def Reserve(self, capacity: int) -> None:
+        """
+        Grows the node arrays so they can hold at least the given number of nodes.
+
+        Args:
+            capacity: The number of nodes required.
+        """
+
+        if capacity <= len(self.boards): return
+        newCapacity = max(capacity, 2 * len(self.boards))
+        for name in ('boards', 'parents', 'moves', 'depths', 'scores'):
+            oldArray = getattr(self, name)
+            newArray = np.full(newCapacity, np.nan) if name == 'scores' else np.zeros(newCapacity, dtype=oldArray.dtype)
+            newArray[:self.size] = oldArray[:self.size]
+            setattr(self, name, newArray)
+
+    def AddNodes(self, boards: np.ndarray, parents: np.ndarray, moves: np.ndarray, depth: int) -> None:
+        """
+        Appends a level of nodes to the tree.
+
+        Args:
+            boards: np.array of the packed boards.
+            parents: np.array of the parent indices.
+            moves: np.array of the moves made from the parents.
+            depth: The depth of the level.
+        """
+
+        count = len(boards)
+        start = self.size
+        self.Reserve(start + count)
+        self.boards[start:start + count] = boards
+        self.parents[start:start + count] = parents
+        self.moves[start:start + count] = moves
+        self.depths[start:start + count] = depth
+        self.size += count
+        self.levels.append((start, self.size))
+        stats = searchstats.ACTIVE
+        stats.nodesGenerated += count
+        if count and depth > stats.maxDepth: stats.maxDepth = depth
+
+    def Expand(self) -> None:
+        """
+        Expands the tree a level at a time until it reaches the maximum depth.
+        """
+
+        stats = searchstats.ACTIVE
+        startTime = time.perf_counter()
+        for depth in range(len(self.levels), self.maxDepth + 1):
+            start, end = self.levels[-1]
+            parentBoards = self.boards[start:end]
+            parentIndices = np.arange(start, end, dtype=np.int32)
+            childBoards = []
+            childParents = []
+            childMoves = []
+            for move in range(4):
+                movedBoards, _ = bitboard.MoveBoards(parentBoards, move)
+                # Moves which change nothing are not added, as with GameState.
+                changed = movedBoards != parentBoards
+                stats.movesPruned += int(len(changed) - np.count_nonzero(changed))
+                childBoards.append(movedBoards[changed])
+                childParents.append(parentIndices[changed])
+                childMoves.append(np.full(np.count_nonzero(changed), move, dtype=np.int8))
+            childBoards = np.concatenate(childBoards)
+            childParents = np.concatenate(childParents)
+            childMoves = np.concatenate(childMoves)
+            # Order the level by parent then move.
+            order = np.lexsort((childMoves, childParents))
+            self.AddNodes(childBoards[order], childParents[order], childMoves[order], depth)
+        stats.expansionTime += time.perf_counter() - startTime
+
+    def GetLeaves(self) -> np.ndarray:
+        """
+        Gets the indices of the leaves at the maximum depth.
+
+        Returns:
+            np.array of the leaf indices.
+        """
+
+        if len(self.levels) <= self.maxDepth:
+            return np.zeros(0, dtype=np.int64)
+        start, end = self.levels[self.maxDepth]
+        return np.arange(start, end)
+
+    def ScoreLeaves(self) -> None:
+        """
+        Scores every unscored leaf with one batched lookup in the heuristic's row table.
+        """
+
+        leaves = self.GetLeaves()
+        leaves = leaves[np.isnan(self.scores[leaves])]
+        if not len(leaves): return
+        stats = searchstats.ACTIVE
+        startTime = time.perf_counter()
+        self.scores[leaves] = heuristics.ScorePackedBoards(self.boards[leaves], self.heuristic)
+        stats.nodesScored += len(leaves)
+        stats.scoringTime += time.perf_counter() - startTime
+
+    def GetRootMoves(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Walks the parent indices up to the first level to find the root move of each node.
+
+        Args:
+            indices: np.array of node indices below the root.
+
+        Returns:
+            np.array of the move made from the root to reach each node.
+        """
+
+        indices = np.asarray(indices)
+        depths = self.depths[indices]
+        for _ in range(self.maxDepth):
+            deeper = depths > 1
+            if not deeper.any(): break
+            indices = np.where(deeper, self.parents[indices], indices)
+            depths = self.depths[indices]
+        return self.moves[indices]
+
+    def FindBestMove(self) -> int:
+        """
+        Finds the root move leading to the leaf with the smallest score.
+
+        Returns:
+            The best next move or -1 if there are no leaves.
+        """
+
+        self.ScoreLeaves()
+        leaves = self.GetLeaves()
+        if not len(leaves): return -1
+        rootMoves = self.GetRootMoves(leaves)
+        if self.removedMoves:
+            allowed = ~np.isin(rootMoves, list(self.removedMoves))
+            leaves = leaves[allowed]
+            rootMoves = rootMoves[allowed]
+            if not len(leaves): return -1
+        scores = self.scores[leaves]
+        if np.min(scores) == math.inf: return -1
+        # np.argmin returns the first smallest leaf, matching the depth first search order.
+        return int(rootMoves[np.argmin(scores)])
+
+    def RemoveChild(self, move: int) -> None:
+        """
+        Removes a root move from the search.
+
+        Args:
+            move: The move to remove.
+        """
+
+        self.removedMoves.add(move)
+
+    def GetChildBoard(self, move: int) -> int:
+        """
+        Gets the packed board of the root's child for the given move.
+
+        Args:
+            move: The move number.
+
+        Returns:
+            The packed board.
+        """
+
+        start, end = self.levels[1]
+        index = np.nonzero(self.moves[start:end] == move)[0]
+        if not len(index):
+            raise ValueError(f"Move {move} does not change the board.")
+        return int(self.boards[start + index[0]])
@@ -0,0 +1,336 @@
+"""
+Description:
+    - Times move generation, the heuristics, the agent and tile recognition on fixed
+      fixtures in test/benchmark.
+    - Writes the results as JSON and compares them with a saved baseline, failing if any
+      benchmark is slower than the baseline by more than the tolerance.
+
+Usage:
+    python scripts/benchmark.py config/appsettings.json --output bench.json
+    python scripts/benchmark.py config/appsettings.json --baseline bench.json
+"""
+
+import argparse
+import gc
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import heuristics
+from agent import CreateAgent
+from state import GameState
+from streamio import ReadConfigFile, ReadColorFile
+
+BENCHMARK_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test', 'benchmark')
+MOVE_NAMES = ('Up', 'Right', 'Down', 'Left')
+AGENT_DEPTHS = (1, 2, 3, 4, 5)
+# Fast benchmarks are looped until each repeat takes at least this many seconds.
+MINIMUM_REPEAT_TIME = 0.2
+
+
+def TimeFunction(function, arguments: list, repeats: int, setup=None) -> dict:
+    """
+    Times a function over a list of arguments. A first untimed pass sets how many passes
+    each repeat makes.
+
+    Args:
+        function: The function to time, called with each argument.
+        arguments: The list of arguments.
+        repeats: The number of times to time the passes.
+        setup: If given, called untimed before every pass to create the function to time,
+            so no pass is timed with state left by the pass before.
+
+    Returns:
+        A dict of the number of calls per repeat and the smallest and median time per
+        call in seconds.
+    """
+
+    def TimePass() -> float:
+        passFunction = setup() if setup is not None else function
+        startTime = time.perf_counter()
+        for argument in arguments:
+            passFunction(argument)
+        return time.perf_counter() - startTime
+
+    passes = max(1, math.ceil(MINIMUM_REPEAT_TIME / max(TimePass(), 1e-9)))
+    times = []
+    for _ in range(repeats):
+        # Collections start at times set by earlier work, so they are kept out of the timing.
+        gc.collect()
+        gc.disable()
+        try:
+            totalTime = sum(TimePass() for _ in range(passes))
+        finally:
+            gc.enable()
+        times.append(totalTime / (passes * len(arguments)))
+    return {
+        'calls': passes * len(arguments),
+        'min': min(times),
+        'median': statistics.median(times)
+    }
+
+def LoadBoards() -> list:
+    """
+    Loads the board corpus.
+
+    Returns:
+        The list of boards as np.arrays.
+    """
+
+    with open(os.path.join(BENCHMARK_DIRECTORY, 'boards.json')) as boardsFile:
+        return [np.array(board, dtype=np.int64) for board in json.load(boardsFile)['boards']]
+
+def BenchmarkMoves(boards: list, repeats: int) -> dict:
+    """
+    Times GameState move generation in each direction.
+
+    Args:
+        boards: The board corpus.
+        repeats: The number of repeats.
+
+    Returns:
+        A dict of the results of each benchmark.
+    """
+
+    results = {}
+    states = [GameState(board, 1, lazy=True) for board in boards]
+    for move, name in enumerate(MOVE_NAMES):
+        results[f'move.{name}'] = TimeFunction(lambda state: state.GenerateChild(move), states, repeats)
+    return results
+
+def BenchmarkHeuristics(boards: list, repeats: int) -> dict:
+    """
+    Times each registered heuristic on single boards.
+
+    Args:
+        boards: The board corpus.
+        repeats: The number of repeats.
+
+    Returns:
+        A dict of the results of each benchmark.
+    """
+
+    results = {}
+    for name, function in heuristics.HEURISTICS.items():
+        results[f'heuristic.{name}'] = TimeFunction(lambda board: function(board).sum(), boards, repeats)
+    return results
+
+def BenchmarkAgent(boards: list, config: dict, repeats: int) -> dict:
+    """
+    Times Agent.GetNextMove at each depth, with the search settings in the configuration.
+
+    Args:
+        boards: The board corpus.
+        config: The configuration dict.
+        repeats: The number of repeats.
+
+    Returns:
+        A dict of the results of each benchmark.
+    """
+
+    results = {}
+    agents = []
+
+    def CreateBenchmarkAgent():
+        # A new agent for every pass, so no pass is timed with the tables of the one before.
+        while agents: agents.pop().Close()
+        agent = CreateAgent(dict(config, maxdepth=depth, adaptivedepth=False, timebudget=0, seed=0))
+        agents.append(agent)
+        return lambda board: agent.GetNextMove(board.tolist())
+
+    try:
+        for depth in AGENT_DEPTHS:
+            # The depth is fixed so every run searches the same trees.
+            results[f'agent.depth{depth}'] = TimeFunction(None, boards, repeats, setup=CreateBenchmarkAgent)
+    finally:
+        while agents: agents.pop().Close()
+    return results
+
+def BenchmarkRecognition(config: dict, repeats: int) -> dict:
+    """
+    Times DivideImage and GetTileNumber on the screenshot fixtures and measures how many
+    tiles are read correctly.
+
+    Args:
+        config: The configuration dict.
+        repeats: The number of repeats.
+
+    Returns:
+        A dict of the results of each benchmark, or of the reason they were skipped.
+    """
+
+    try:
+        from PIL import Image
+        from recognition import DivideImage, GetTileNumber
+    except ImportError as error:
+        return {'recognition': {'skipped': str(error)}}
+
+    screenshotDirectory = os.path.join(BENCHMARK_DIRECTORY, 'screenshots')
+    with open(os.path.join(screenshotDirectory, 'screenshots.json')) as screenshotsFile:
+        screenshots = json.load(screenshotsFile)['screenshots']
+    colorList = ReadColorFile(config['colors'])
+    images = []
+    for screenshot in screenshots:
+        with Image.open(os.path.join(screenshotDirectory, screenshot['image'])) as image:
+            images.append(image.convert('RGB'))
+    tileImages = [tile for image in images for row in DivideImage(image, config) for tile in row]
+
+    results = {
+        'recognition.DivideImage': TimeFunction(lambda image: DivideImage(image, config), images, repeats),
+        'recognition.GetTileNumber': TimeFunction(
+            lambda tile: GetTileNumber(tile, colorList, config['knn']),
+            tileImages,
+            repeats
+        )
+    }
+    correctTiles = 0
+    for image, screenshot in zip(images, screenshots):
+        for tileRow, boardRow in zip(DivideImage(image, config), screenshot['board']):
+            for tile, value in zip(tileRow, boardRow):
+                correctTiles += GetTileNumber(tile, colorList, config['knn'])[0] == value
+    results['recognition.accuracy'] = {'tiles': len(tileImages), 'correct': int(correctTiles)}
+    return results
+
+def RunBenchmarks(config: dict, repeats: int) -> dict:
+    """
+    Runs every benchmark.
+
+    Args:
+        config: The configuration dict.
+        repeats: The number of repeats.
+
+    Returns:
+        A dict of the machine details and the results of each benchmark.
+    """
+
+    boards = LoadBoards()
+    results = {}
+    results.update(BenchmarkMoves(boards, repeats))
+    results.update(BenchmarkHeuristics(boards, repeats))
+    results.update(BenchmarkAgent(boards, config, repeats))
+    results.update(BenchmarkRecognition(config, repeats))
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'benchmarks': results
+    }
+
+def GetSpread(result: dict) -> float:
+    """
+    Gets how far the median time of a benchmark is above its smallest time, as a
+    measure of the noise in its repeats.
+
+    Args:
+        result: The result of a benchmark.
+
+    Returns:
+        The spread as a fraction of the smallest time.
+    """
+
+    return result['median'] / result['min'] - 1
+
+def CompareResults(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compares the smallest times of the results with a baseline, as the smallest time is
+    the least affected by other work on the machine. A benchmark only regresses if its
+    time grows by more than the tolerance plus the spread of both runs, so noisy
+    benchmarks need a larger slowdown to fail.
+
+    Args:
+        results: The benchmark results.
+        baseline: The baseline benchmark results.
+        tolerance: The fraction a time may grow by before it is a regression.
+
+    Returns:
+        The list of the names of the benchmarks which regressed.
+    """
+
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        baselineResult = baseline['benchmarks'].get(name)
+        if 'min' not in result or baselineResult is None or 'min' not in baselineResult: continue
+        ratio = result['min'] / baselineResult['min']
+        threshold = 1 + tolerance + GetSpread(result) + GetSpread(baselineResult)
+        regressed = ratio > threshold
+        if regressed: regressions.append(name)
+        print(
+            f"{name:50} {baselineResult['min'] * 1e6:12.1f}us {result['min'] * 1e6:12.1f}us "
+            f"{ratio:6.2f}x (limit {threshold:.2f}x){'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+def MergeResults(results: dict, newResults: dict) -> dict:
+    """
+    Keeps the faster result of each benchmark from two runs, so a benchmark slowed by
+    other work on the machine in one run is timed by the other.
+
+    Args:
+        results: The benchmark results.
+        newResults: The results of running the benchmarks again.
+
+    Returns:
+        The merged benchmark results.
+    """
+
+    merged = dict(results, benchmarks=dict(results['benchmarks']))
+    for name, result in newResults['benchmarks'].items():
+        previousResult = merged['benchmarks'].get(name)
+        if previousResult is None or 'min' not in previousResult or result.get('min', math.inf) < previousResult['min']:
+            merged['benchmarks'][name] = result
+    return merged
+
+def GetArguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Returns:
+        The parsed arguments.
+    """
+
+    parser = argparse.ArgumentParser(description="Runs the performance benchmarks.")
+    parser.add_argument('config', help="The filepath to the config file.")
+    parser.add_argument('--output', help="The filepath to write the results to as JSON.")
+    parser.add_argument('--baseline', help="The filepath to the results to compare against.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="The allowed slowdown as a fraction of the baseline.")
+    parser.add_argument('--repeats', type=int, default=10, help="The number of times each benchmark is run.")
+    parser.add_argument('--retries', type=int, default=2, help="The number of times the benchmarks are run again to confirm a regression.")
+    return parser.parse_args()
+
+def main():
+    arguments = GetArguments()
+    config = ReadConfigFile(arguments.config)
+    heuristics.LoadRowTables(config['heuristictables'])
+
+    results = RunBenchmarks(config, arguments.repeats)
+    regressions = []
+    if arguments.baseline:
+        with open(arguments.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        regressions = CompareResults(results, baseline, arguments.tolerance)
+        # Only slowdowns seen in every run are regressions; a single run can be slowed by the machine.
+        for _ in range(arguments.retries):
+            if not regressions: break
+            print(f"Running the benchmarks again to confirm {len(regressions)} regressions.")
+            results = MergeResults(results, RunBenchmarks(config, arguments.repeats))
+            regressions = CompareResults(results, baseline, arguments.tolerance)
+    if arguments.output:
+        with open(arguments.output, 'w') as outputFile:
+            json.dump(results, outputFile, indent=4)
+    elif not arguments.baseline:
+        print(json.dumps(results, indent=4))
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    main()
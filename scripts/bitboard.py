@@ -0,0 +1,489 @@
+"""
+Description:
+    - Packs a 4x4 game board into a single 64-bit integer (4 bits per log2 exponent).
+    - Performs moves through precomputed 65536-entry row and column lookup tables.
+    - Converts packed boards to and from the np.array boards used by the rest of the program.
+
+Layout:
+    The tile at row y, column x is stored in the nibble starting at bit 4 * (4 * y + x).
+    A nibble holds the log2 exponent of the tile (0 for an empty tile), so the largest
+    tile that can be represented is 2 ** 15 = 32768. Boards are only encoded while their
+    largest tile is below 2 ** 15 so two of them never need combining.
+"""
+
+import numpy as np
+
+ROW_MASK = 0xFFFF
+COL_MASK = 0x000F000F000F000F
+MAX_EXPONENT = 15
+
+
+def ReverseRow(row: int) -> int:
+    """
+    Reverses the order of the four tiles in a packed row.
+
+    Args:
+        row: The 16-bit packed row.
+
+    Returns:
+        The reversed 16-bit packed row.
+    """
+
+    return ((row >> 12) | ((row >> 4) & 0x00F0) | ((row << 4) & 0x0F00) | (row << 12)) & ROW_MASK
+
+def UnpackColumn(row: int) -> int:
+    """
+    Spreads a 16-bit packed row down the first column of a 64-bit board.
+
+    Args:
+        row: The 16-bit packed row.
+
+    Returns:
+        The 64-bit board with the row's tiles in the first column.
+    """
+
+    return (row | (row << 12) | (row << 24) | (row << 36)) & COL_MASK
+
+def Transpose(board: int) -> int:
+    """
+    Transposes a packed board so rows become columns.
+
+    Args:
+        board: The 64-bit packed board.
+
+    Returns:
+        The transposed 64-bit packed board.
+    """
+
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return (b1 | (b2 >> 24) | (b3 << 24)) & 0xFFFFFFFFFFFFFFFF
+
+def MoveRowLeft(row: int) -> tuple:
+    """
+    Slides and combines the tiles of a packed row to the left.
+
+    Args:
+        row: The 16-bit packed row.
+
+    Returns:
+        The resulting 16-bit packed row.
+        The score gained from the tiles combined.
+    """
+
+    tiles = [(row >> (4 * i)) & 0xF for i in range(4)]
+    tiles = [tile for tile in tiles if tile]
+    result = []
+    score = 0
+    i = 0
+    while i < len(tiles):
+        # Tiles of 2 ** 15 are not combined as the result would not fit in a nibble.
+        if i + 1 < len(tiles) and tiles[i] == tiles[i + 1] and tiles[i] < MAX_EXPONENT:
+            result.append(tiles[i] + 1)
+            score += 2 ** (tiles[i] + 1)
+            i += 2
+        else:
+            result.append(tiles[i])
+            i += 1
+    packed = 0
+    for i, tile in enumerate(result):
+        packed |= tile << (4 * i)
+    return packed, score
+
+def BuildTables() -> dict:
+    """
+    Builds the row and column move tables for every possible packed row.
+
+    Returns:
+        A dict of the lookup tables. The row and column tables hold the value to xor
+        into the board to apply the move, the score tables hold the score gained.
+    """
+
+    rowLeft = [0] * 65536
+    rowRight = [0] * 65536
+    colUp = [0] * 65536
+    colDown = [0] * 65536
+    scoreLeft = [0] * 65536
+    scoreRight = [0] * 65536
+    for row in range(65536):
+        leftRow, leftScore = MoveRowLeft(row)
+        reversedRow = ReverseRow(row)
+        rightRow, rightScore = MoveRowLeft(reversedRow)
+        rightRow = ReverseRow(rightRow)
+        rowLeft[row] = row ^ leftRow
+        rowRight[row] = row ^ rightRow
+        colUp[row] = UnpackColumn(row) ^ UnpackColumn(leftRow)
+        colDown[row] = UnpackColumn(row) ^ UnpackColumn(rightRow)
+        scoreLeft[row] = leftScore
+        scoreRight[row] = rightScore
+    return {
+        'rowLeft': rowLeft,
+        'rowRight': rowRight,
+        'colUp': colUp,
+        'colDown': colDown,
+        'scoreLeft': scoreLeft,
+        'scoreRight': scoreRight
+    }
+
+TABLES = BuildTables()
+ROW_LEFT = TABLES['rowLeft']
+ROW_RIGHT = TABLES['rowRight']
+COL_UP = TABLES['colUp']
+COL_DOWN = TABLES['colDown']
+SCORE_LEFT = TABLES['scoreLeft']
+SCORE_RIGHT = TABLES['scoreRight']
+
+# np.array copies of the tables for the vectorized functions.
+NP_ROW_LEFT = np.array(ROW_LEFT, dtype=np.uint64)
+NP_ROW_RIGHT = np.array(ROW_RIGHT, dtype=np.uint64)
+NP_SCORE_LEFT = np.array(SCORE_LEFT, dtype=np.int64)
+NP_SCORE_RIGHT = np.array(SCORE_RIGHT, dtype=np.int64)
+
+
+# =======================================
+# SINGLE BOARDS
+# =======================================
+
+
+
+def CanEncode(array: np.array) -> bool:
+    """
+    Checks if a board can be represented as a packed board.
+
+    Args:
+        array: The board as a 2D-array of tile values.
+
+    Returns:
+        True if the board is 4x4 and every tile is 0 or a power of 2 smaller than 2 ** 15.
+    """
+
+    array = np.asarray(array)
+    if array.shape != (4, 4): return False
+    for value in array.flat:
+        value = int(value)
+        if value == 0: continue
+        if value < 2 or value & (value - 1) or value >= 2 ** MAX_EXPONENT:
+            return False
+    return True
+
+def HasMaxTile(board: int) -> bool:
+    """
+    Checks if a packed board holds a tile of 2 ** 15, the largest representable tile.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        True if any nibble of the board is 0xF.
+    """
+
+    return bool(board & (board >> 1) & (board >> 2) & (board >> 3) & 0x1111111111111111)
+
+def EncodeBoard(array: np.array) -> int:
+    """
+    Packs a 4x4 board into a 64-bit integer.
+
+    Args:
+        array: The board as a 2D-array of tile values.
+
+    Returns:
+        The packed board.
+    """
+
+    board = 0
+    for i, value in enumerate(np.asarray(array).flat):
+        value = int(value)
+        if value:
+            board |= (value.bit_length() - 1) << (4 * i)
+    return board
+
+def DecodeBoard(board: int) -> np.array:
+    """
+    Unpacks a 64-bit integer into a 4x4 board.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        np.array of the tile values.
+    """
+
+    array = np.zeros((4, 4), dtype=np.int64)
+    for i in range(16):
+        exponent = (board >> (4 * i)) & 0xF
+        if exponent:
+            array[i // 4, i % 4] = 1 << exponent
+    return array
+
+def MoveBoard(board: int, move: int) -> int:
+    """
+    Performs a move on a packed board.
+
+    Args:
+        board: The packed board.
+        move: integer representing the move.
+            0 - Up,
+            1 - Right,
+            2 - Down,
+            3 - Left
+
+    Returns:
+        The packed board after the move. Equal to board if the move changes nothing.
+    """
+
+    if move == 0:
+        transposed = Transpose(board)
+        board ^= COL_UP[transposed & ROW_MASK]
+        board ^= COL_UP[(transposed >> 16) & ROW_MASK] << 4
+        board ^= COL_UP[(transposed >> 32) & ROW_MASK] << 8
+        board ^= COL_UP[(transposed >> 48) & ROW_MASK] << 12
+    elif move == 1:
+        board ^= ROW_RIGHT[board & ROW_MASK]
+        board ^= ROW_RIGHT[(board >> 16) & ROW_MASK] << 16
+        board ^= ROW_RIGHT[(board >> 32) & ROW_MASK] << 32
+        board ^= ROW_RIGHT[(board >> 48) & ROW_MASK] << 48
+    elif move == 2:
+        transposed = Transpose(board)
+        board ^= COL_DOWN[transposed & ROW_MASK]
+        board ^= COL_DOWN[(transposed >> 16) & ROW_MASK] << 4
+        board ^= COL_DOWN[(transposed >> 32) & ROW_MASK] << 8
+        board ^= COL_DOWN[(transposed >> 48) & ROW_MASK] << 12
+    elif move == 3:
+        board ^= ROW_LEFT[board & ROW_MASK]
+        board ^= ROW_LEFT[(board >> 16) & ROW_MASK] << 16
+        board ^= ROW_LEFT[(board >> 32) & ROW_MASK] << 32
+        board ^= ROW_LEFT[(board >> 48) & ROW_MASK] << 48
+    else:
+        raise ValueError(f"Invalid move: {move}")
+    return board
+
+def EmptyCells(board: int) -> list:
+    """
+    Finds the empty tiles on a packed board.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        The list of the indices of the empty tiles, from 0 to 15 in row order.
+    """
+
+    return [i for i in range(16) if not (board >> (4 * i)) & 0xF]
+
+def SpawnTile(board: int, cell: int, exponent: int) -> int:
+    """
+    Places a new tile on an empty tile of a packed board.
+
+    Args:
+        board: The packed board.
+        cell: The index of the empty tile, from EmptyCells.
+        exponent: The log2 value of the new tile.
+
+    Returns:
+        The packed board with the new tile.
+    """
+
+    return board | (exponent << (4 * cell))
+
+
+# =======================================
+# SYMMETRIES
+# =======================================
+
+
+
+# Each of the 8 symmetries is numbered by the operations it applies, in this order:
+#     4 - Transpose,
+#     1 - Flip left to right,
+#     2 - Flip top to bottom
+SYMMETRY_TRANSPOSE = 4
+SYMMETRY_FLIP_HORIZONTAL = 1
+SYMMETRY_FLIP_VERTICAL = 2
+
+def FlipHorizontal(board: int) -> int:
+    """
+    Mirrors a packed board from left to right.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        The mirrored packed board.
+    """
+
+    return (
+        ReverseRow(board & ROW_MASK) |
+        (ReverseRow((board >> 16) & ROW_MASK) << 16) |
+        (ReverseRow((board >> 32) & ROW_MASK) << 32) |
+        (ReverseRow((board >> 48) & ROW_MASK) << 48)
+    )
+
+def FlipVertical(board: int) -> int:
+    """
+    Mirrors a packed board from top to bottom.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        The mirrored packed board.
+    """
+
+    return (
+        ((board & ROW_MASK) << 48) |
+        (((board >> 16) & ROW_MASK) << 32) |
+        (((board >> 32) & ROW_MASK) << 16) |
+        (board >> 48)
+    )
+
+def TransformBoard(board: int, symmetry: int) -> int:
+    """
+    Applies one of the 8 symmetries to a packed board.
+
+    Args:
+        board: The packed board.
+        symmetry: The number of the symmetry, from 0 to 7.
+
+    Returns:
+        The transformed packed board.
+    """
+
+    if symmetry & SYMMETRY_TRANSPOSE:
+        board = Transpose(board)
+    if symmetry & SYMMETRY_FLIP_HORIZONTAL:
+        board = FlipHorizontal(board)
+    if symmetry & SYMMETRY_FLIP_VERTICAL:
+        board = FlipVertical(board)
+    return board
+
+def CanonicalBoard(board: int) -> tuple:
+    """
+    Maps a packed board to the smallest of its 8 symmetries, so every symmetry of a board
+    has the same representative.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        The canonical packed board.
+        The number of the symmetry which transforms board into the canonical board.
+    """
+
+    transposed = Transpose(board)
+    bestBoard = board
+    bestSymmetry = 0
+    for base, baseSymmetry in ((board, 0), (transposed, SYMMETRY_TRANSPOSE)):
+        flippedH = FlipHorizontal(base)
+        for candidate, symmetry in (
+            (base, baseSymmetry),
+            (flippedH, baseSymmetry | SYMMETRY_FLIP_HORIZONTAL),
+            (FlipVertical(base), baseSymmetry | SYMMETRY_FLIP_VERTICAL),
+            (FlipVertical(flippedH), baseSymmetry | SYMMETRY_FLIP_HORIZONTAL | SYMMETRY_FLIP_VERTICAL)):
+            if candidate < bestBoard:
+                bestBoard = candidate
+                bestSymmetry = symmetry
+    return bestBoard, bestSymmetry
+
+
+# =======================================
+# BATCHES OF BOARDS
+# =======================================
+
+
+
+def EncodeBoards(arrays: np.ndarray) -> np.ndarray:
+    """
+    Packs a stack of 4x4 boards into 64-bit integers.
+
+    Args:
+        arrays: np.array of shape (N, 4, 4) of tile values.
+
+    Returns:
+        np.array of shape (N,) of packed boards.
+    """
+
+    arrays = np.asarray(arrays, dtype=np.int64).reshape(-1, 16)
+    exponents = np.zeros(arrays.shape, dtype=np.uint64)
+    nonZero = arrays > 0
+    exponents[nonZero] = np.log2(arrays[nonZero]).round().astype(np.uint64)
+    shifts = np.arange(0, 64, 4, dtype=np.uint64)
+    return np.bitwise_or.reduce(exponents << shifts, axis=1)
+
+def DecodeBoards(boards: np.ndarray) -> np.ndarray:
+    """
+    Unpacks a stack of 64-bit integers into 4x4 boards.
+
+    Args:
+        boards: np.array of shape (N,) of packed boards.
+
+    Returns:
+        np.array of shape (N, 4, 4) of tile values.
+    """
+
+    boards = np.asarray(boards, dtype=np.uint64)
+    shifts = np.arange(0, 64, 4, dtype=np.uint64)
+    exponents = ((boards[:, None] >> shifts) & np.uint64(0xF)).astype(np.int64)
+    arrays = np.where(exponents > 0, np.left_shift(1, exponents), 0)
+    return arrays.reshape(-1, 4, 4)
+
+def TransposeBoards(boards: np.ndarray) -> np.ndarray:
+    """
+    Transposes a stack of packed boards.
+
+    Args:
+        boards: np.array of shape (N,) of packed boards.
+
+    Returns:
+        np.array of shape (N,) of transposed packed boards.
+    """
+
+    boards = np.asarray(boards, dtype=np.uint64)
+    a1 = boards & np.uint64(0xF0F00F0FF0F00F0F)
+    a2 = boards & np.uint64(0x0000F0F00000F0F0)
+    a3 = boards & np.uint64(0x0F0F00000F0F0000)
+    a = a1 | (a2 << np.uint64(12)) | (a3 >> np.uint64(12))
+    b1 = a & np.uint64(0xFF00FF0000FF00FF)
+    b2 = a & np.uint64(0x00FF00FF00000000)
+    b3 = a & np.uint64(0x00000000FF00FF00)
+    return b1 | (b2 >> np.uint64(24)) | (b3 << np.uint64(24))
+
+def MoveBoards(boards: np.ndarray, move: int) -> tuple:
+    """
+    Performs the same move on a stack of packed boards.
+
+    Args:
+        boards: np.array of shape (N,) of packed boards.
+        move: integer representing the move.
+            0 - Up,
+            1 - Right,
+            2 - Down,
+            3 - Left
+
+    Returns:
+        np.array of shape (N,) of the packed boards after the move.
+        np.array of shape (N,) of the score gained by each board.
+    """
+
+    if move not in (0, 1, 2, 3):
+        raise ValueError(f"Invalid move: {move}")
+    boards = np.asarray(boards, dtype=np.uint64)
+    # Up and down are performed as left and right on the transposed board.
+    vertical = move == 0 or move == 2
+    rows = TransposeBoards(boards) if vertical else boards
+    rowTable = NP_ROW_LEFT if move == 0 or move == 3 else NP_ROW_RIGHT
+    scoreTable = NP_SCORE_LEFT if move == 0 or move == 3 else NP_SCORE_RIGHT
+    result = rows.copy()
+    scores = np.zeros(rows.shape, dtype=np.int64)
+    for i in range(4):
+        shift = np.uint64(16 * i)
+        index = ((rows >> shift) & np.uint64(ROW_MASK)).astype(np.intp)
+        result ^= rowTable[index] << shift
+        scores += scoreTable[index]
+    if vertical:
+        result = TransposeBoards(result)
+    return result, scores
@@ -0,0 +1,143 @@
+"""
+Description:
+    - Holds the transposition table used to share work between duplicate board positions.
+    - Builds the keys the table is indexed by.
+    - Maps packed 4x4 boards to a single representative of their 8 symmetries so
+      symmetric positions share one entry.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+import bitboard
+
+
+class TranspositionTable:
+    """
+    Class to represent a bounded table of results keyed by board position.
+
+    When the table is full the least recently used entry is evicted. If the table is
+    canonical, MakeKey gives every symmetry of a packed 4x4 board the same key, which is
+    only valid for values that do not change under the symmetries, such as heuristic
+    scores. Other boards keep their plain keys, as finding their symmetries costs more
+    than the entries they share save.
+    """
+
+    def __init__(self, maxSize: int, canonical: bool = False) -> None:
+        self.maxSize = maxSize
+        self.canonical = canonical
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def MakeKey(self, array: np.array, board: object = None) -> object:
+        """
+        Gets the key of a board for this table.
+
+        Args:
+            array: The board as a 2D-array of tile values.
+            board: The packed board, if there is one.
+
+        Returns:
+            The canonical key if the table is canonical, otherwise the board key.
+        """
+
+        if self.canonical:
+            return CanonicalKey(array, board)
+        return BoardKey(array, board)
+
+    def Get(self, key: object, default: object = None) -> object:
+        """
+        Gets the entry for a key, marking it as recently used.
+
+        Args:
+            key: The key of the entry.
+            default: The value returned if the key is not in the table.
+
+        Returns:
+            The entry or the default value.
+        """
+
+        entry = self.__entries.get(key, default)
+        if entry is default:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return entry
+
+    def Put(self, key: object, value: object) -> None:
+        """
+        Stores an entry, evicting the least recently used entries if the table is full.
+
+        Args:
+            key: The key of the entry.
+            value: The value to store.
+        """
+
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.maxSize:
+            self.__entries.popitem(last=False)
+            self.evictions += 1
+
+    def Clear(self) -> None:
+        """
+        Removes every entry. The hit and miss counts are kept.
+        """
+
+        self.__entries.clear()
+
+    def GetStats(self) -> dict:
+        """
+        Gets the table's counters.
+
+        Returns:
+            A dict of the hits, misses, evictions and current size.
+        """
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.__entries)
+        }
+
+
+def BoardKey(array: np.array, board: object = None) -> object:
+    """
+    Gets the key of a board for use in a TranspositionTable.
+
+    Args:
+        array: The board as a 2D-array of tile values.
+        board: The packed board from bitboard.py or gridboard.py, if there is one.
+
+    Returns:
+        The packed board, or the shape and bytes of the array if the board is not packed.
+    """
+
+    if board is not None:
+        return board
+    array = np.asarray(array, dtype=np.int64)
+    return (array.shape, array.tobytes())
+
+def CanonicalKey(array: np.array, board: object = None) -> object:
+    """
+    Gets the key shared by all 8 symmetries of a packed 4x4 board.
+
+    Args:
+        array: The board as a 2D-array of tile values.
+        board: The packed board, if there is one.
+
+    Returns:
+        The canonical packed board for packed 4x4 boards, otherwise the board key.
+    """
+
+    if board is not None and not isinstance(board, tuple):
+        return bitboard.CanonicalBoard(board)[0]
+    return BoardKey(array, board)
@@ -0,0 +1,135 @@
+"""
+Description:
+    - Reads the game state from the page DOM through the Selenium web driver.
+    - Enters moves by sending arrow keys to the page.
+    - PageScreen lets game.py play the page with the same loop as the screen.
+    - Works with play2048.co and the offline page in test/web/2048.html, which both mark
+      each tile with its value and position in its class names.
+"""
+
+import logging
+import pathlib
+import re
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+# Returns the class names of every tile in one call, as each call is a round trip to the browser.
+TILE_CLASSES_SCRIPT = "return Array.from(document.querySelectorAll('.tile-container .tile')).map(tile => tile.className);"
+TILE_VALUE_PATTERN = re.compile(r'\btile-(\d+)\b')
+TILE_POSITION_PATTERN = re.compile(r'\btile-position-(\d+)-(\d+)\b')
+MOVE_KEYS = (
+    ('UP', Keys.ARROW_UP),
+    ('RIGHT', Keys.ARROW_RIGHT),
+    ('DOWN', Keys.ARROW_DOWN),
+    ('LEFT', Keys.ARROW_LEFT)
+)
+
+
+def GetPageUrl(url: str) -> str:
+    """
+    Gets the url of the game page, turning a filepath into a file url.
+
+    Args:
+        url: The url or filepath of the game page.
+
+    Returns:
+        The url to open.
+    """
+
+    if re.match(r'^[a-z]+://', url): return url
+    return pathlib.Path(url.replace('\\', '/')).resolve().as_uri()
+
+def GetPageInformation(driver, gridSize: int) -> tuple:
+    """
+    Reads the tile values from the page, in the same form as interface.GetInformation.
+
+    Args:
+        driver: The Selenium web driver showing the game.
+        gridSize: The width and height of the board.
+
+    Returns:
+        A 2D-list of the tile values.
+        A 2D-list of tile colors, all None as no image is read.
+    """
+
+    tileNumberList = [[0] * gridSize for _ in range(gridSize)]
+    for className in driver.execute_script(TILE_CLASSES_SCRIPT):
+        valueMatch = TILE_VALUE_PATTERN.search(className)
+        positionMatch = TILE_POSITION_PATTERN.search(className)
+        if valueMatch is None or positionMatch is None: continue
+        # Positions count from 1, with the column first.
+        x = int(positionMatch.group(1)) - 1
+        y = int(positionMatch.group(2)) - 1
+        # While two tiles are merging, both stay on the page under the merged tile.
+        tileNumberList[y][x] = max(tileNumberList[y][x], int(valueMatch.group(1)))
+    tileColorList = [[None] * gridSize for _ in range(gridSize)]
+    return tileNumberList, tileColorList
+
+def PressPageKey(driver, keyNum: int) -> None:
+    """
+    Sends up, down, left, or right to the page.
+
+    Args:
+        driver: The Selenium web driver showing the game.
+        keyNum: integer representing the key to be pressed.
+            0 - Up,
+            1 - Right,
+            2 - Down,
+            3 - Left
+    """
+
+    if keyNum not in (0, 1, 2, 3):
+        raise ValueError(f"Invalid key: {keyNum}")
+    name, key = MOVE_KEYS[keyNum]
+    logging.info(f'== Pressed: {name} ==')
+    driver.find_element(By.TAG_NAME, 'body').send_keys(key)
+
+
+class PageScreen:
+    """
+    Class to play the game on the page, with GetBoardImage, GetInformation and PressKey in
+    the same form as interface.py.
+    """
+
+    def __init__(self, driver) -> None:
+        self.driver = driver
+
+    def GetBoardImage(self, config: dict) -> None:
+        """
+        Gets the image of the board, which is never needed as the page is read directly.
+
+        Args:
+            config: The configuration dict.
+
+        Returns:
+            None.
+        """
+
+        return None
+
+    def GetInformation(self, config: dict, colorList: list, image: object = None) -> tuple:
+        """
+        Reads the board from the page, in the same form as interface.GetInformation.
+
+        Args:
+            config: The configuration dict.
+            colorList: The list of all known colors, unused as no colors are read.
+            image: Unused, as the page is read directly.
+
+        Returns:
+            A 2D-list of the tile values.
+            A 2D-list of tile colors, all None as no image is read.
+        """
+
+        return GetPageInformation(self.driver, config['2048']['gridsize'])
+
+    def PressKey(self, keyNum: int) -> None:
+        """
+        Sends up, down, left, or right to the page, in the same form as interface.PressKey.
+
+        Args:
+            keyNum: integer representing the key to be pressed.
+        """
+
+        PressPageKey(self.driver, keyNum)
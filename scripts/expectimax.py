@@ -0,0 +1,239 @@
+"""
+Description:
+    - Searches the game with expectimax, modelling the random tile that spawns after
+      every move with chance nodes over the empty tiles.
+    - A 2 spawns with probability 0.9 and a 4 with probability 0.1.
+    - Branches whose probability of being reached falls below a threshold are scored
+      instead of being searched, and the results of chance nodes are cached.
+    - With a time budget the search is deepened a move at a time, so a turn never takes
+      much longer than the budget however many tiles are empty.
+"""
+
+import math
+import time
+
+import numpy as np
+
+import bitboard
+import gridboard
+import heuristics
+import searchstats
+from cache import TranspositionTable
+
+SPAWN_PROBABILITIES = ((1, 0.9), (2, 0.1))
+# Added to the score of a board with no moves left, as the search looks for the smallest score.
+GAME_OVER_PENALTY = 1e6
+
+
+def CanSearch(array: np.array) -> bool:
+    """
+    Checks if a board can be searched with expectimax.
+
+    Args:
+        array: The board as a 2D-array of tile values.
+
+    Returns:
+        True if the board can be packed by bitboard.py or gridboard.py.
+    """
+
+    return bitboard.CanEncode(array) or gridboard.CanEncode(array)
+
+class ExpectimaxSearch:
+    """
+    Class to represent an expectimax search from one board.
+
+    The agent picks the move with the smallest expected score, where the score is the
+    heuristic cost of the board. maxDepth is the number of moves the agent looks ahead.
+    If timeBudget is above 0, maxDepth is the deepest the search goes in that many
+    milliseconds.
+    """
+
+    def __init__(
+        self,
+        array: np.array,
+        maxDepth: int,
+        probabilityThreshold: float = 0.0001,
+        table: TranspositionTable = None,
+        heuristic: str = 'DifferenceInLog2',
+        timeBudget: float = 0) -> None:
+        if bitboard.CanEncode(array):
+            self.engine = bitboard
+        elif gridboard.CanEncode(array):
+            self.engine = gridboard
+        else:
+            raise ValueError("The board cannot be packed for expectimax search.")
+        self.board = self.engine.EncodeBoard(array)
+        self.maxDepth = maxDepth
+        self.probabilityThreshold = probabilityThreshold
+        self.table = table if table is not None else TranspositionTable(100000)
+        self.heuristic = heuristic
+        self.timeBudget = timeBudget
+        # The time.perf_counter() value to stop searching at.
+        self.deadline = None
+        # The depth the last search completed.
+        self.reachedDepth = 0
+        self.removedMoves = set()
+
+    def ScoreBoard(self, board: object) -> float:
+        """
+        Scores a packed board with the heuristic.
+
+        Args:
+            board: The packed board.
+
+        Returns:
+            The board score.
+        """
+
+        stats = searchstats.ACTIVE
+        startTime = time.perf_counter()
+        if self.engine is bitboard:
+            score = heuristics.ScorePackedBoard(board, self.heuristic)
+        else:
+            score = float(heuristics.GetHeuristic(self.heuristic)(self.engine.DecodeBoard(board)).sum())
+        stats.nodesScored += 1
+        stats.scoringTime += time.perf_counter() - startTime
+        return score
+
+    def SearchMoveNode(self, board: object, depth: int, probability: float) -> float:
+        """
+        Finds the smallest expected score of the moves from a board.
+
+        Args:
+            board: The packed board.
+            depth: The number of moves left to search.
+            probability: The probability of reaching the board.
+
+        Returns:
+            The smallest expected score.
+        """
+
+        if depth == 0:
+            return self.ScoreBoard(board)
+        stats = searchstats.ACTIVE
+        bestScore = math.inf
+        for move in range(4):
+            childBoard = self.engine.MoveBoard(board, move)
+            if childBoard == board:
+                stats.movesPruned += 1
+                continue
+            stats.nodesGenerated += 1
+            bestScore = min(bestScore, self.SearchChanceNode(childBoard, depth, probability))
+        if bestScore == math.inf:
+            return self.ScoreBoard(board) + GAME_OVER_PENALTY
+        return bestScore
+
+    def SearchChanceNode(self, board: object, depth: int, probability: float) -> float:
+        """
+        Finds the expected score over every tile which can spawn on a board after a move.
+
+        Args:
+            board: The packed board after the move.
+            depth: The number of moves left to search, including the move just made.
+            probability: The probability of reaching the board.
+
+        Returns:
+            The expected score.
+        """
+
+        # The last move is scored without a spawn, as the tree in GameState does.
+        if depth <= 1 or probability < self.probabilityThreshold:
+            return self.ScoreBoard(board)
+        key = (self.table.MakeKey(None, board), depth)
+        expectedScore = self.table.Get(key)
+        if expectedScore is not None: return expectedScore
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise TimeoutError("The search ran out of time.")
+        emptyCells = self.engine.EmptyCells(board)
+        if not emptyCells:
+            return self.ScoreBoard(board)
+        expectedScore = 0
+        stats = searchstats.ACTIVE
+        stats.nodesGenerated += len(emptyCells) * len(SPAWN_PROBABILITIES)
+        if self.maxDepth - depth + 1 > stats.maxDepth: stats.maxDepth = self.maxDepth - depth + 1
+        for cell in emptyCells:
+            for exponent, spawnProbability in SPAWN_PROBABILITIES:
+                cellProbability = spawnProbability / len(emptyCells)
+                spawnedBoard = self.engine.SpawnTile(board, cell, exponent)
+                expectedScore += cellProbability * self.SearchMoveNode(
+                    spawnedBoard,
+                    depth - 1,
+                    probability * cellProbability
+                )
+        self.table.Put(key, expectedScore)
+        return expectedScore
+
+    def FindBestMove(self) -> int:
+        """
+        Finds the move with the smallest expected score. With a time budget the search is
+        deepened a move at a time up to maxDepth, and the move of the deepest search to
+        finish within the budget is used.
+
+        Returns:
+            The best next move or -1 if there are no moves.
+        """
+
+        if self.timeBudget <= 0:
+            self.reachedDepth = self.maxDepth
+            return self.FindBestMoveAtDepth(self.maxDepth)
+        deadline = time.perf_counter() + self.timeBudget / 1000
+        bestMove = -1
+        self.reachedDepth = 0
+        for depth in range(1, self.maxDepth + 1):
+            # The first depth always completes so there is a move to make.
+            self.deadline = deadline if depth > 1 else None
+            try:
+                bestMove = self.FindBestMoveAtDepth(depth)
+            except TimeoutError:
+                break
+            finally:
+                self.deadline = None
+            self.reachedDepth = depth
+            if time.perf_counter() >= deadline: break
+        return bestMove
+
+    def FindBestMoveAtDepth(self, maxDepth: int) -> int:
+        """
+        Finds the move with the smallest expected score, looking a number of moves ahead.
+
+        Args:
+            maxDepth: The number of moves to look ahead.
+
+        Returns:
+            The best next move or -1 if there are no moves.
+        """
+
+        bestScore = math.inf
+        bestMove = -1
+        for move in range(4):
+            if move in self.removedMoves: continue
+            childBoard = self.engine.MoveBoard(self.board, move)
+            if childBoard == self.board: continue
+            score = self.SearchChanceNode(childBoard, maxDepth, 1.0)
+            if score < bestScore:
+                bestScore = score
+                bestMove = move
+        return bestMove
+
+    def RemoveChild(self, move: int) -> None:
+        """
+        Removes a root move from the search.
+
+        Args:
+            move: The move to remove.
+        """
+
+        self.removedMoves.add(move)
+
+    def GetChildArray(self, move: int) -> np.array:
+        """
+        Gets the board made by performing a move from the root.
+
+        Args:
+            move: The move number.
+
+        Returns:
+            The board as a 2D-array of tile values.
+        """
+
+        return self.engine.DecodeBoard(self.engine.MoveBoard(self.board, move))
@@ -0,0 +1,268 @@
+"""
+Description:
+    - Plays a game with the agent until it finds no move, on the screen, on the page
+      through the web driver or on the simulator.
+    - Each of them is a screen with GetBoardImage, GetInformation and PressKey, in the
+      same form as interface.py, so every game is played by the same loop.
+    - Needs no browser, screen or keyboard packages itself, so headless games can be
+      played in worker processes.
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from agent import CreateAgent
+from reconcile import CompareStates
+from recording import CreateRecorder
+from state import MoveBoards
+
+
+def PlayGame(config: dict, colorList: list, screen) -> dict:
+    """
+    Loops over the game until the game is over.
+    
+    Args:
+        config: The configuration dict.
+        colorDict: The list of all known colors.
+        screen: The game to play: the interface module, a dominterface.PageScreen or a
+            simulator.Simulator.
+
+    Returns:
+        A dict of the record data of the game.
+    """
+    # Define an instance of Agent
+    agent = CreateAgent(config)
+    recorder = CreateRecorder(config)
+    nextMove = 0
+    turnNumber = 0
+
+    predictedArray = None
+
+    try:
+        while True: #nextMove >= 0:
+            # Sleep
+            Wait(config)
+            # Read data from screen
+            readStartTime = time.perf_counter()
+            tileNumberList, tileColorList, image = ReadBoard(config, colorList, screen)
+            readTime = time.perf_counter() - readStartTime
+            readArray = [row[:] for row in tileNumberList]
+            # Compare prediected and read arrays. Boards not read from an image are exact.
+            if image is not None:
+                tileNumberList = CompareStates(tileNumberList, predictedArray, tileColorList, colorList, config)
+            # Pass data to agent and get responce from agent
+            searchStartTime = time.perf_counter()
+            nextMove = agent.GetNextMove(tileNumberList)
+            searchTime = time.perf_counter() - searchStartTime
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"Search stats: {agent.lastStats.ToDict()}")
+                logging.debug(f"Cache stats so far: {agent.GetCacheStats()}")
+            if recorder is not None:
+                recorder.AddFrame(image, readArray, tileNumberList, nextMove, readTime, searchTime)
+            # Checks if game is over
+            if nextMove < 0:
+                break
+            predictedArray = agent.GetArrayOfNextMove(nextMove)
+            # Sleep
+            Wait(config)
+            # Enter response
+            screen.PressKey(nextMove)
+            turnNumber += 1
+    finally:
+        agent.Close()
+
+    logging.debug(f"Total search stats: {agent.totalStats.ToDict()}")
+    logging.debug(f"Total cache stats: {agent.GetCacheStats()}")
+    if recorder is not None:
+        logging.info(f"Recorded the session to {recorder.filepath}.")
+    return {
+        "score": CalculateScore(tileNumberList),
+        "highest value": GetHighestTile(tileNumberList),
+        "total moves": turnNumber
+    }
+
+def PlayGamePipelined(config: dict, colorList: list, screen) -> dict:
+    """
+    Loops over the game until the game is over, capturing and reading the next board in a
+    worker thread while the agent searches the boards the next board is likely to be.
+    
+    Args:
+        config: The configuration dict.
+        colorDict: The list of all known colors.
+        screen: The game to play, as in PlayGame.
+
+    Returns:
+        A dict of the record data of the game.
+    """
+    # Define an instance of Agent
+    agent = CreateAgent(config)
+    # Guessed boards are searched by their own agent, so they do not change the stats or
+    # the tree of the real search. It searches in this process, as the real search's
+    # worker processes are idle while the board is being read.
+    speculativeAgent = CreateAgent(dict(config, workers=0))
+    recorder = CreateRecorder(config)
+    nextMove = 0
+    turnNumber = 0
+    speculationHits = 0
+
+    predictedArray = None
+
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while True:
+                # Read data from screen in the worker thread
+                capture = executor.submit(CaptureBoard, config, colorList, screen)
+                # Search the likely boards until the read board is ready
+                speculativeMoves = {}
+                if predictedArray is not None:
+                    for candidateArray in GetSpawnCandidates(predictedArray):
+                        if capture.done(): break
+                        key = candidateArray.tobytes()
+                        speculativeMoves[key] = speculativeAgent.GetNextMove(candidateArray.tolist())
+                tileNumberList, tileColorList, image, readTime = capture.result()
+                readArray = [row[:] for row in tileNumberList]
+                searchStartTime = time.perf_counter()
+                # Compare prediected and read arrays. Boards not read from an image are exact.
+                if image is not None:
+                    tileNumberList = CompareStates(tileNumberList, predictedArray, tileColorList, colorList, config)
+                # Use the speculative search if it searched the read board
+                key = np.array(tileNumberList, dtype=np.int64).tobytes()
+                if key in speculativeMoves:
+                    nextMove = speculativeMoves[key]
+                    speculationHits += 1
+                else:
+                    nextMove = agent.GetNextMove(tileNumberList)
+                if recorder is not None:
+                    searchTime = time.perf_counter() - searchStartTime
+                    recorder.AddFrame(image, readArray, tileNumberList, nextMove, readTime, searchTime)
+                # Checks if game is over
+                if nextMove < 0:
+                    break
+                predictedArray = MoveBoards(np.array(tileNumberList)[None], nextMove)[0][0]
+                # Enter response
+                screen.PressKey(nextMove)
+                turnNumber += 1
+    finally:
+        agent.Close()
+        speculativeAgent.Close()
+
+    logging.debug(f"Speculative search found {speculationHits} of {turnNumber} moves.")
+    logging.debug(f"Total search stats: {agent.totalStats.ToDict()}")
+    logging.debug(f"Total cache stats: {agent.GetCacheStats()}")
+    logging.debug(f"Total speculative search stats: {speculativeAgent.totalStats.ToDict()}")
+    if recorder is not None:
+        logging.info(f"Recorded the session to {recorder.filepath}.")
+    return {
+        "score": CalculateScore(tileNumberList),
+        "highest value": GetHighestTile(tileNumberList),
+        "total moves": turnNumber
+    }
+
+def CaptureBoard(config: dict, colorList: list, screen) -> tuple:
+    """
+    Waits for the move animation to finish, then reads the board.
+    
+    Args:
+        config: The configuration dict.
+        colorList: The list of all known colors.
+        screen: The game being played.
+        
+    Returns:
+        A 2D-list of the read tile values.
+        A 2D-list of the read tile colors.
+        The image of the board, or None if it was not read from an image.
+        The seconds taken to read the board, not counting the wait.
+    """
+
+    Wait(config)
+    readStartTime = time.perf_counter()
+    tileNumberList, tileColorList, image = ReadBoard(config, colorList, screen)
+    return tileNumberList, tileColorList, image, time.perf_counter() - readStartTime
+
+def Wait(config: dict) -> None:
+    """
+    Waits the turn delay between reading the board and entering a move. The simulator plays with no delay, so it skips the sleep.
+
+    Args:
+        config: The game config.
+    """
+
+    if config['turndelay'] > 0:
+        time.sleep(config['turndelay'])
+
+def ReadBoard(config: dict, colorList: list, screen) -> tuple:
+    """
+    Reads the board from the screen, the page or the simulator.
+    
+    Args:
+        config: The configuration dict.
+        colorList: The list of all known colors.
+        screen: The game being played.
+        
+    Returns:
+        A 2D-list of the read tile values.
+        A 2D-list of the read tile colors, all None if the board was not read from an image.
+        The image of the board, or None if the board was not read from an image.
+    """
+
+    image = screen.GetBoardImage(config)
+    tileNumberList, tileColorList = screen.GetInformation(config, colorList, image)
+    return tileNumberList, tileColorList, image
+
+def GetSpawnCandidates(predictedArray: np.ndarray) -> list:
+    """
+    Lists the boards the predicted board can become when a tile spawns, most likely first.
+    
+    Args:
+        predictedArray: The board after the move, before the tile spawns.
+        
+    Returns:
+        The list of boards with a 2 on each empty tile, then with a 4 on each empty tile.
+    """
+
+    candidates = []
+    emptyCells = np.flatnonzero(predictedArray == 0)
+    for value in (2, 4):
+        for cell in emptyCells:
+            candidateArray = np.array(predictedArray, dtype=np.int64)
+            candidateArray.flat[cell] = value
+            candidates.append(candidateArray)
+    return candidates
+
+def CalculateScore(tileNumberList: list) -> int:
+    """
+    Sums up all the numbers on the board.
+    
+    Args:
+        tileNumberList: a 2D-arry representing the game board.
+        
+    Returns:
+        The sum of all numbers on the board.
+    """
+
+    total = 0
+    for row in tileNumberList:
+        for element in row:
+            total += element
+    return total
+
+def GetHighestTile(tileNumberList: list) -> int:
+    """
+    Finds the highest number on the board.
+    
+    Args:
+        tileNumberList: a 2D-arry representing the game board.
+        
+    Returns:
+        The highest number on the board.
+    """
+
+    maxNum = 0
+    for row in tileNumberList:
+        for elemnet in row:
+            if elemnet > maxNum:
+                maxNum = elemnet
+    return maxNum
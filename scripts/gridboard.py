@@ -0,0 +1,369 @@
+"""
+Description:
+    - Packs a square game board of any size into a tuple of integers, one per row, with
+      5 bits per log2 exponent, for boards which do not fit the 64-bit engine in bitboard.py.
+    - Performs moves through row tables kept for each row length. Rows are added to a
+      table the first time they are moved rather than precomputing every possible row.
+    - Saves the row tables to disk so later runs start with the rows already seen.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+BITS = 5
+TILE_MASK = (1 << BITS) - 1
+MAX_EXPONENT = TILE_MASK
+
+
+def MoveTilesLeft(tiles: list) -> tuple:
+    """
+    Slides and combines a row of tile exponents to the left.
+
+    Args:
+        tiles: The list of tile exponents, 0 for an empty tile.
+
+    Returns:
+        The list of resulting tile exponents.
+        The score gained from the tiles combined.
+    """
+
+    tiles = [tile for tile in tiles if tile]
+    result = []
+    score = 0
+    i = 0
+    while i < len(tiles):
+        if i + 1 < len(tiles) and tiles[i] == tiles[i + 1] and tiles[i] < MAX_EXPONENT:
+            result.append(tiles[i] + 1)
+            score += 2 ** (tiles[i] + 1)
+            i += 2
+        else:
+            result.append(tiles[i])
+            i += 1
+    return result, score
+
+def UnpackRow(row: int, length: int) -> list:
+    """
+    Unpacks a row into a list of tile exponents.
+
+    Args:
+        row: The packed row.
+        length: The number of tiles in the row.
+
+    Returns:
+        The list of tile exponents.
+    """
+
+    return [(row >> (BITS * i)) & TILE_MASK for i in range(length)]
+
+def PackRow(tiles: list) -> int:
+    """
+    Packs a list of tile exponents into a row.
+
+    Args:
+        tiles: The list of tile exponents.
+
+    Returns:
+        The packed row.
+    """
+
+    row = 0
+    for i, tile in enumerate(tiles):
+        row |= tile << (BITS * i)
+    return row
+
+
+class RowTable:
+    """
+    Class to represent the move table for rows of one length.
+
+    Each entry maps a packed row to the row after moving left, the score gained, the
+    row after moving right and the score gained.
+    """
+
+    def __init__(self, length: int) -> None:
+        self.length = length
+        self.rows = {}
+        # True if rows have been added since the table was loaded or saved.
+        self.modified = False
+
+    def Get(self, row: int) -> tuple:
+        """
+        Gets the entry for a packed row, generating it if the row has not been seen.
+
+        Args:
+            row: The packed row.
+
+        Returns:
+            The row moved left, its score, the row moved right and its score.
+        """
+
+        entry = self.rows.get(row)
+        if entry is None:
+            tiles = UnpackRow(row, self.length)
+            leftTiles, leftScore = MoveTilesLeft(tiles)
+            rightTiles, rightScore = MoveTilesLeft(tiles[::-1])
+            rightTiles = [0] * (self.length - len(rightTiles)) + rightTiles[::-1]
+            entry = (PackRow(leftTiles), leftScore, PackRow(rightTiles), rightScore)
+            self.rows[row] = entry
+            self.modified = True
+        return entry
+
+    def Load(self, filepath: str) -> None:
+        """
+        Adds the rows saved in a cache file to the table.
+
+        Args:
+            filepath: The filepath to the .npz cache file.
+        """
+
+        with np.load(filepath) as cacheFile:
+            entries = zip(
+                cacheFile['rows'].tolist(),
+                cacheFile['left'].tolist(),
+                cacheFile['leftScores'].tolist(),
+                cacheFile['right'].tolist(),
+                cacheFile['rightScores'].tolist()
+            )
+            for row, left, leftScore, right, rightScore in entries:
+                self.rows[row] = (left, leftScore, right, rightScore)
+
+    def Save(self, filepath: str) -> None:
+        """
+        Saves the table to a cache file.
+
+        Args:
+            filepath: The filepath to the .npz cache file.
+        """
+
+        rows = list(self.rows.keys())
+        entries = list(self.rows.values())
+        np.savez(
+            filepath,
+            rows=np.array(rows, dtype=np.int64),
+            left=np.array([entry[0] for entry in entries], dtype=np.int64),
+            leftScores=np.array([entry[1] for entry in entries], dtype=np.int64),
+            right=np.array([entry[2] for entry in entries], dtype=np.int64),
+            rightScores=np.array([entry[3] for entry in entries], dtype=np.int64)
+        )
+        self.modified = False
+
+
+ROW_TABLES = {}
+CACHE_DIRECTORY = None
+
+def SetCacheDirectory(directory: str) -> None:
+    """
+    Sets the directory the row tables are loaded from and saved to.
+
+    Args:
+        directory: The directory of the cache files.
+    """
+
+    global CACHE_DIRECTORY
+    CACHE_DIRECTORY = directory
+    ROW_TABLES.clear()
+
+def GetCacheFilepath(length: int) -> str:
+    """
+    Gets the filepath of the cache file for a row length.
+
+    Args:
+        length: The row length.
+
+    Returns:
+        The filepath or None if there is no cache directory.
+    """
+
+    if CACHE_DIRECTORY is None: return None
+    return os.path.join(CACHE_DIRECTORY, f'rows{length}.npz')
+
+def GetRowTable(length: int) -> RowTable:
+    """
+    Gets the row table for a row length, loading it from the cache directory the first time.
+
+    Args:
+        length: The row length.
+
+    Returns:
+        The row table.
+    """
+
+    table = ROW_TABLES.get(length)
+    if table is None:
+        table = RowTable(length)
+        filepath = GetCacheFilepath(length)
+        if filepath is not None and os.path.exists(filepath):
+            logging.debug(f"Loading row table from {filepath}.")
+            table.Load(filepath)
+        ROW_TABLES[length] = table
+    return table
+
+def SaveRowTables() -> None:
+    """
+    Saves every row table with new rows to the cache directory.
+    """
+
+    if CACHE_DIRECTORY is None: return
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+    for length, table in ROW_TABLES.items():
+        if table.modified:
+            table.Save(GetCacheFilepath(length))
+
+
+# =======================================
+# BOARDS
+# =======================================
+
+
+
+def CanEncode(array: np.array) -> bool:
+    """
+    Checks if a board can be represented as a packed board.
+
+    Args:
+        array: The board as a 2D-array of tile values.
+
+    Returns:
+        True if the board is square and every tile is 0 or a power of 2 smaller than 2 ** 31.
+    """
+
+    array = np.asarray(array)
+    if array.ndim != 2 or array.shape[0] != array.shape[1] or not array.size: return False
+    for value in array.flat:
+        value = int(value)
+        if value == 0: continue
+        if value < 2 or value & (value - 1) or value >= 2 ** MAX_EXPONENT:
+            return False
+    return True
+
+def HasMaxTile(board: tuple) -> bool:
+    """
+    Checks if a packed board holds a tile of 2 ** 31, the largest representable tile.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        True if any tile has the largest exponent.
+    """
+
+    for row in board:
+        while row:
+            if row & TILE_MASK == MAX_EXPONENT: return True
+            row >>= BITS
+    return False
+
+def EncodeBoard(array: np.array) -> tuple:
+    """
+    Packs a board into a tuple of packed rows.
+
+    Args:
+        array: The board as a 2D-array of tile values.
+
+    Returns:
+        The packed board.
+    """
+
+    return tuple(
+        PackRow([int(value).bit_length() - 1 if value else 0 for value in row])
+        for row in np.asarray(array)
+    )
+
+def DecodeBoard(board: tuple) -> np.array:
+    """
+    Unpacks a tuple of packed rows into a board.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        np.array of the tile values.
+    """
+
+    size = len(board)
+    exponents = np.array([UnpackRow(row, size) for row in board], dtype=np.int64)
+    return np.where(exponents > 0, np.left_shift(1, exponents), 0)
+
+def Transpose(board: tuple) -> tuple:
+    """
+    Transposes a packed board so rows become columns.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        The transposed packed board.
+    """
+
+    size = len(board)
+    columns = [0] * size
+    for y, row in enumerate(board):
+        shift = BITS * y
+        for x in range(size):
+            columns[x] |= ((row >> (BITS * x)) & TILE_MASK) << shift
+    return tuple(columns)
+
+def MoveBoard(board: tuple, move: int) -> tuple:
+    """
+    Performs a move on a packed board.
+
+    Args:
+        board: The packed board.
+        move: integer representing the move.
+            0 - Up,
+            1 - Right,
+            2 - Down,
+            3 - Left
+
+    Returns:
+        The packed board after the move. Equal to board if the move changes nothing.
+    """
+
+    if move not in (0, 1, 2, 3):
+        raise ValueError(f"Invalid move: {move}")
+    # Up and down are performed as left and right on the transposed board.
+    vertical = move == 0 or move == 2
+    rows = Transpose(board) if vertical else board
+    table = GetRowTable(len(board))
+    column = 0 if move == 0 or move == 3 else 2
+    movedRows = tuple(table.Get(row)[column] for row in rows)
+    return Transpose(movedRows) if vertical else movedRows
+
+def EmptyCells(board: tuple) -> list:
+    """
+    Finds the empty tiles on a packed board.
+
+    Args:
+        board: The packed board.
+
+    Returns:
+        The list of the (y, x) positions of the empty tiles.
+    """
+
+    size = len(board)
+    return [
+        (y, x)
+        for y, row in enumerate(board)
+        for x in range(size)
+        if not (row >> (BITS * x)) & TILE_MASK
+    ]
+
+def SpawnTile(board: tuple, cell: tuple, exponent: int) -> tuple:
+    """
+    Places a new tile on an empty tile of a packed board.
+
+    Args:
+        board: The packed board.
+        cell: The (y, x) position of the empty tile, from EmptyCells.
+        exponent: The log2 value of the new tile.
+
+    Returns:
+        The packed board with the new tile.
+    """
+
+    y, x = cell
+    rows = list(board)
+    rows[y] |= exponent << (BITS * x)
+    return tuple(rows)
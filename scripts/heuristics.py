@@ -0,0 +1,390 @@
+"""
+Description:
+    - NumPy-vectorized versions of the game state scoring heuristics.
+    - Every heuristic accepts a single (H, W) board or an (N, H, W) stack of boards and
+      works on shifted copies of the array rather than looping over each tile.
+    - Scores whole stacks of boards in one call.
+    - Holds the registry of heuristics which can be selected in appsettings.json.
+    - Each heuristic is split into a score per row and per column, which is precomputed
+      into a table indexed by packed row so a packed board is scored with 8 lookups.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+import bitboard
+
+
+def Log2Array(arrays: np.ndarray) -> np.ndarray:
+    """
+    Calculates the log2 value of every tile, leaving empty tiles as 0.
+
+    Args:
+        arrays: np.array of tile values.
+
+    Returns:
+        np.array of the log2 values.
+    """
+
+    arrays = np.asarray(arrays, dtype=np.float64)
+    logArray = np.zeros(arrays.shape)
+    np.log2(arrays, out=logArray, where=arrays > 0)
+    return logArray
+
+def DifferenceInLog2(arrays: np.ndarray) -> np.ndarray:
+    """
+    Sums the difference between each tile's log2 value and the log2 values of its
+    neighboring tiles. Empty tiles score 0 and empty neighbors count as log2 value 0.
+
+    Args:
+        arrays: np.array of shape (H, W) or (N, H, W) of tile values.
+
+    Returns:
+        np.array of the per tile values with the same shape as arrays.
+    """
+
+    logArray = Log2Array(arrays)
+    nonZero = logArray > 0
+    tempArray = np.zeros(logArray.shape)
+    # Each horizontal pair adds its difference to every non-empty tile of the pair.
+    horizontal = np.abs(logArray[..., :, 1:] - logArray[..., :, :-1])
+    tempArray[..., :, :-1] += horizontal * nonZero[..., :, :-1]
+    tempArray[..., :, 1:] += horizontal * nonZero[..., :, 1:]
+    # Each vertical pair does the same.
+    vertical = np.abs(logArray[..., 1:, :] - logArray[..., :-1, :])
+    tempArray[..., :-1, :] += vertical * nonZero[..., :-1, :]
+    tempArray[..., 1:, :] += vertical * nonZero[..., 1:, :]
+    return tempArray
+
+def SumProductOfFourAdjacentTiles(arrays: np.ndarray) -> np.ndarray:
+    """
+    Sums the products of each tile's value and the values of its four neighboring tiles.
+
+    Args:
+        arrays: np.array of shape (H, W) or (N, H, W) of tile values.
+
+    Returns:
+        np.array of the per tile values with the same shape as arrays.
+    """
+
+    arrays = np.asarray(arrays, dtype=np.float64)
+    neighbors = np.zeros(arrays.shape)
+    neighbors[..., :, 1:] += arrays[..., :, :-1]
+    neighbors[..., :, :-1] += arrays[..., :, 1:]
+    neighbors[..., 1:, :] += arrays[..., :-1, :]
+    neighbors[..., :-1, :] += arrays[..., 1:, :]
+    return arrays * neighbors
+
+def SumProductOfTwoAdjacentTiles(arrays: np.ndarray) -> np.ndarray:
+    """
+    Sums the products of each tile's value and the values of the tiles to its left and above.
+
+    Args:
+        arrays: np.array of shape (H, W) or (N, H, W) of tile values.
+
+    Returns:
+        np.array of the per tile values with the same shape as arrays.
+    """
+
+    arrays = np.asarray(arrays, dtype=np.float64)
+    neighbors = np.zeros(arrays.shape)
+    neighbors[..., :, 1:] += arrays[..., :, :-1]
+    neighbors[..., 1:, :] += arrays[..., :-1, :]
+    return arrays * neighbors
+
+def SumProductOfFourAdjacentTilesWithBounds(arrays: np.ndarray) -> np.ndarray:
+    """
+    Sums the products of each tile's value and the values of its four neighboring tiles.
+    Each side of a tile that touches the bounds adds the tile's value squared.
+
+    Args:
+        arrays: np.array of shape (H, W) or (N, H, W) of tile values.
+
+    Returns:
+        np.array of the per tile values with the same shape as arrays.
+    """
+
+    arrays = np.asarray(arrays, dtype=np.float64)
+    # Padding with a copy of the edge tiles makes every bound a neighbor with the same value.
+    padWidth = [(0, 0)] * (arrays.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(arrays, padWidth, mode='edge')
+    neighbors = (
+        padded[..., 1:-1, :-2] +
+        padded[..., 1:-1, 2:] +
+        padded[..., :-2, 1:-1] +
+        padded[..., 2:, 1:-1]
+    )
+    return arrays * neighbors
+
+
+# =======================================
+# ROW HEURISTICS
+# =======================================
+
+
+
+def DifferenceInLog2Rows(rows: np.ndarray) -> np.ndarray:
+    """
+    Scores the horizontal part of DifferenceInLog2 for a stack of rows.
+
+    Args:
+        rows: np.array of shape (M, W) of tile values.
+
+    Returns:
+        np.array of shape (M,) of the row scores.
+    """
+
+    return DifferenceInLog2(rows[:, None, :]).sum(axis=(1, 2))
+
+def SumProductOfFourAdjacentTilesRows(rows: np.ndarray) -> np.ndarray:
+    """
+    Scores the horizontal part of SumProductOfFourAdjacentTiles for a stack of rows.
+
+    Args:
+        rows: np.array of shape (M, W) of tile values.
+
+    Returns:
+        np.array of shape (M,) of the row scores.
+    """
+
+    return SumProductOfFourAdjacentTiles(rows[:, None, :]).sum(axis=(1, 2))
+
+def SumProductOfTwoAdjacentTilesRows(rows: np.ndarray) -> np.ndarray:
+    """
+    Scores the horizontal part of SumProductOfTwoAdjacentTiles for a stack of rows.
+
+    Args:
+        rows: np.array of shape (M, W) of tile values.
+
+    Returns:
+        np.array of shape (M,) of the row scores.
+    """
+
+    return SumProductOfTwoAdjacentTiles(rows[:, None, :]).sum(axis=(1, 2))
+
+def SumProductOfFourAdjacentTilesWithBoundsRows(rows: np.ndarray) -> np.ndarray:
+    """
+    Scores the horizontal part of SumProductOfFourAdjacentTilesWithBounds for a stack of rows.
+
+    Args:
+        rows: np.array of shape (M, W) of tile values.
+
+    Returns:
+        np.array of shape (M,) of the row scores.
+    """
+
+    rows = np.asarray(rows, dtype=np.float64)
+    padded = np.pad(rows, [(0, 0), (1, 1)], mode='edge')
+    return (rows * (padded[:, :-2] + padded[:, 2:])).sum(axis=1)
+
+
+# =======================================
+# REGISTRY
+# =======================================
+
+
+
+HEURISTICS = {}
+ROW_HEURISTICS = {}
+ROW_TABLES = {}
+# Heuristics whose board score does not change when the board is rotated or mirrored.
+SYMMETRIC_HEURISTICS = set()
+# List copies of the row tables, which are faster to index with a single int.
+ROW_LISTS = {}
+
+def RegisterHeuristic(name: str, function: object, rowFunction: object = None, symmetric: bool = False) -> None:
+    """
+    Adds a heuristic to the registry.
+
+    Args:
+        name: The name used to select the heuristic in appsettings.json.
+        function: Scores (H, W) or (N, H, W) boards, returning the per tile values.
+        rowFunction: Scores an (M, W) stack of rows. Every board score must equal the sum
+            of the row function over its rows and columns. If None, packed boards are
+            scored with function instead of row tables.
+        symmetric: True if the board score is the same for all 8 symmetries of a board.
+            Symmetric heuristics share cache entries between symmetric boards when
+            'symmetrickeys' is set, so this must only be True if it holds for every board.
+    """
+
+    HEURISTICS[name] = function
+    if symmetric:
+        SYMMETRIC_HEURISTICS.add(name)
+    else:
+        SYMMETRIC_HEURISTICS.discard(name)
+    if rowFunction is not None:
+        ROW_HEURISTICS[name] = rowFunction
+    ROW_TABLES.pop(name, None)
+    ROW_LISTS.pop(name, None)
+
+# The built-in heuristics score a row the same as its reverse and score rows and columns
+# alike, so they score every symmetry of a board the same.
+RegisterHeuristic('DifferenceInLog2', DifferenceInLog2, DifferenceInLog2Rows, symmetric=True)
+RegisterHeuristic('SumProductOfFourAdjacentTiles', SumProductOfFourAdjacentTiles, SumProductOfFourAdjacentTilesRows, symmetric=True)
+RegisterHeuristic('SumProductOfTwoAdjacentTiles', SumProductOfTwoAdjacentTiles, SumProductOfTwoAdjacentTilesRows, symmetric=True)
+RegisterHeuristic(
+    'SumProductOfFourAdjacentTilesWithBounds',
+    SumProductOfFourAdjacentTilesWithBounds,
+    SumProductOfFourAdjacentTilesWithBoundsRows,
+    symmetric=True
+)
+
+def GetHeuristic(name: str) -> object:
+    """
+    Gets a heuristic from the registry.
+
+    Args:
+        name: The name of the heuristic.
+
+    Returns:
+        The heuristic function.
+    """
+
+    if name not in HEURISTICS:
+        raise ValueError(f"Unknown heuristic: {name}")
+    return HEURISTICS[name]
+
+def IsSymmetric(name: str) -> bool:
+    """
+    Checks if a heuristic scores every symmetry of a board the same.
+
+    Args:
+        name: The name of the heuristic.
+
+    Returns:
+        True if the heuristic is symmetric.
+    """
+
+    return name in SYMMETRIC_HEURISTICS
+
+def BuildRowTable(name: str) -> np.ndarray:
+    """
+    Scores every possible packed row with a heuristic's row function.
+
+    Args:
+        name: The name of the heuristic.
+
+    Returns:
+        np.array of shape (65536,) of the row scores.
+    """
+
+    packedRows = np.arange(65536, dtype=np.uint64)
+    shifts = np.arange(0, 16, 4, dtype=np.uint64)
+    exponents = ((packedRows[:, None] >> shifts) & np.uint64(0xF)).astype(np.int64)
+    rows = np.where(exponents > 0, np.left_shift(1, exponents), 0)
+    return ROW_HEURISTICS[name](rows).astype(np.float64)
+
+def GetRowTable(name: str) -> np.ndarray:
+    """
+    Gets a heuristic's row table, building it the first time it is needed.
+
+    Args:
+        name: The name of the heuristic.
+
+    Returns:
+        np.array of shape (65536,) of the row scores or None if the heuristic has no row function.
+    """
+
+    if name not in ROW_HEURISTICS: return None
+    if name not in ROW_TABLES:
+        ROW_TABLES[name] = BuildRowTable(name)
+        ROW_LISTS[name] = ROW_TABLES[name].tolist()
+    return ROW_TABLES[name]
+
+def LoadRowTables(filepath: str = None, save: bool = True) -> None:
+    """
+    Loads the row tables of every registered heuristic from a cache file, building and
+    saving any tables which are missing from it.
+
+    Args:
+        filepath: The filepath to the .npz cache file. If None, the tables are only built.
+        save: If False, missing tables are built but the cache file is not written, so
+            worker processes do not race to write it.
+    """
+
+    cached = {}
+    if filepath and os.path.exists(filepath):
+        with np.load(filepath) as cacheFile:
+            cached = {name: cacheFile[name] for name in cacheFile.files}
+    missing = False
+    for name in ROW_HEURISTICS:
+        table = cached.get(name)
+        if table is None or table.shape != (65536,):
+            logging.debug(f"Building row table for {name}.")
+            table = BuildRowTable(name)
+            missing = True
+        ROW_TABLES[name] = table
+        ROW_LISTS[name] = table.tolist()
+    if filepath and missing and save:
+        np.savez(filepath, **{name: ROW_TABLES[name] for name in ROW_HEURISTICS})
+
+def ScorePackedBoard(board: int, heuristic: str = 'DifferenceInLog2') -> float:
+    """
+    Scores a packed board by looking up each of its rows and columns in the row table.
+
+    Args:
+        board: The packed board.
+        heuristic: The name of the heuristic to score the board with.
+
+    Returns:
+        The board score.
+    """
+
+    if GetRowTable(heuristic) is None:
+        return float(GetHeuristic(heuristic)(bitboard.DecodeBoard(board)).sum())
+    table = ROW_LISTS[heuristic]
+    transposed = bitboard.Transpose(board)
+    return float(
+        table[board & 0xFFFF] +
+        table[(board >> 16) & 0xFFFF] +
+        table[(board >> 32) & 0xFFFF] +
+        table[(board >> 48) & 0xFFFF] +
+        table[transposed & 0xFFFF] +
+        table[(transposed >> 16) & 0xFFFF] +
+        table[(transposed >> 32) & 0xFFFF] +
+        table[(transposed >> 48) & 0xFFFF]
+    )
+
+def ScorePackedBoards(boards: np.ndarray, heuristic: str = 'DifferenceInLog2') -> np.ndarray:
+    """
+    Scores a stack of packed boards with the row table.
+
+    Args:
+        boards: np.array of shape (N,) of packed boards.
+        heuristic: The name of the heuristic to score the boards with.
+
+    Returns:
+        np.array of shape (N,) of the board scores.
+    """
+
+    table = GetRowTable(heuristic)
+    boards = np.asarray(boards, dtype=np.uint64)
+    if table is None:
+        return ScoreBoards(bitboard.DecodeBoards(boards), heuristic)
+    transposed = bitboard.TransposeBoards(boards)
+    scores = np.zeros(boards.shape)
+    for i in range(4):
+        shift = np.uint64(16 * i)
+        scores += table[((boards >> shift) & np.uint64(0xFFFF)).astype(np.intp)]
+        scores += table[((transposed >> shift) & np.uint64(0xFFFF)).astype(np.intp)]
+    return scores
+
+def ScoreBoards(arrays: np.ndarray, heuristic: str = 'DifferenceInLog2') -> np.ndarray:
+    """
+    Scores a stack of boards in one call.
+
+    Args:
+        arrays: np.array of shape (N, H, W) of tile values.
+        heuristic: The name of the heuristic to score the boards with.
+
+    Returns:
+        np.array of shape (N,) of the board scores.
+    """
+
+    function = GetHeuristic(heuristic)
+    arrays = np.asarray(arrays)
+    if arrays.ndim != 3:
+        raise ValueError(f"Expected an (N, H, W) array of boards, got shape {arrays.shape}.")
+    return function(arrays).sum(axis=(1, 2))
@@ -0,0 +1,312 @@
+"""
+Description:
+    - Plays many games at once with asyncio, on the simulator or in headless browsers
+      read through the page DOM.
+    - The moves of every session are searched by one shared pool of worker processes, so
+      one session's waits for the page overlap the other sessions' searches.
+    - Each session keeps its own board, move count and timings. The worker agents only
+      search the boards they are sent, so no session state is kept in an Agent.
+
+Usage:
+    python scripts/orchestrator.py config/appsettings.json --games 32 --sessions 8
+    python scripts/orchestrator.py config/appsettings.json --games 8 --sessions 4 --browser
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from agent import CreateAgent
+from dominterface import GetPageUrl, GetPageInformation, PressPageKey
+from heuristics import LoadRowTables
+from gridboard import SetCacheDirectory
+from simulator import Simulator
+from streamio import ReadConfigFile, AppendRecordData
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+# The Agent in each worker process, created by InitialiseWorker.
+WORKER_AGENT = None
+
+
+def InitialiseWorker(config: dict) -> None:
+    """
+    Loads the heuristic and move tables and creates the Agent used by a worker process.
+    The parent has already built any missing tables and saved them to the cache file.
+
+    Args:
+        config: The configuration dict.
+    """
+
+    global WORKER_AGENT
+    logging.disable(logging.INFO)
+    LoadRowTables(config['heuristictables'], save=False)
+    SetCacheDirectory(config['rowtables'])
+    WORKER_AGENT = CreateAgent(dict(config, workers=0))
+
+def SearchBoard(tileNumberList: list) -> int:
+    """
+    Finds the next move for a board in a worker process.
+
+    Args:
+        tileNumberList: A 2D-list of the tile values.
+
+    Returns:
+        A number representing the next move, negative if the game is over.
+    """
+
+    return WORKER_AGENT.GetNextMove(tileNumberList)
+
+def CreateBrowser() -> webdriver.Chrome:
+    """
+    Launches a headless Chrome web driver.
+
+    Returns:
+        The web driver.
+    """
+
+    options = Options()
+    options.add_argument('--headless=new')
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])
+    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+
+
+class SimulatedSession:
+    """
+    Class to represent a game played on the simulator.
+    """
+
+    def __init__(self, config: dict, seed: int) -> None:
+        self.config = config
+        self.simulator = Simulator(config['2048']['gridsize'], seed)
+
+    async def ReadBoard(self) -> list:
+        """
+        Reads the board.
+
+        Returns:
+            A 2D-list of the tile values.
+        """
+
+        return self.simulator.GetInformation(self.config, [])[0]
+
+    async def EnterMove(self, move: int) -> None:
+        """
+        Performs a move.
+
+        Args:
+            move: integer representing the move.
+        """
+
+        self.simulator.PressKey(move)
+
+
+class BrowserSession:
+    """
+    Class to represent a game played in a browser, read and played through the page DOM.
+
+    The web driver blocks, so its calls are run in threads to keep the event loop free.
+    """
+
+    def __init__(self, config: dict, driver: webdriver.Chrome, seed: int) -> None:
+        self.driver = driver
+        self.gridSize = config['2048']['gridsize']
+        self.turnDelay = config['turndelay']
+        self.url = GetPageUrl(config['url'])
+        # The offline page in test/web spawns its tiles from the seed in the url.
+        if self.url.startswith('file:') and seed is not None:
+            self.url += f'?seed={seed}'
+
+    async def Start(self) -> None:
+        """
+        Opens a new game.
+        """
+
+        await asyncio.to_thread(self.driver.get, self.url)
+
+    async def ReadBoard(self) -> list:
+        """
+        Waits for the move animation to finish, then reads the board from the page.
+
+        Returns:
+            A 2D-list of the tile values.
+        """
+
+        await asyncio.sleep(self.turnDelay)
+        tileNumberList, _ = await asyncio.to_thread(GetPageInformation, self.driver, self.gridSize)
+        return tileNumberList
+
+    async def EnterMove(self, move: int) -> None:
+        """
+        Sends a move to the page.
+
+        Args:
+            move: integer representing the move.
+        """
+
+        await asyncio.to_thread(PressPageKey, self.driver, move)
+
+
+async def PlaySession(session: object, executor: ProcessPoolExecutor) -> dict:
+    """
+    Plays a game until the agent finds no move, searching each board in the worker pool.
+
+    Args:
+        session: The SimulatedSession or BrowserSession to play.
+        executor: The pool of search workers.
+
+    Returns:
+        A dict of the record data of the game and the seconds spent searching and waiting
+        on the game.
+    """
+
+    loop = asyncio.get_running_loop()
+    turnNumber = 0
+    searchTime = 0.0
+    startTime = time.perf_counter()
+    while True:
+        tileNumberList = await session.ReadBoard()
+        searchStartTime = time.perf_counter()
+        nextMove = await loop.run_in_executor(executor, SearchBoard, tileNumberList)
+        searchTime += time.perf_counter() - searchStartTime
+        if nextMove < 0:
+            break
+        await session.EnterMove(nextMove)
+        turnNumber += 1
+    return {
+        "score": sum(sum(row) for row in tileNumberList),
+        "highest value": max(max(row) for row in tileNumberList),
+        "total moves": turnNumber,
+        "search time": searchTime,
+        "game time": time.perf_counter() - startTime - searchTime
+    }
+
+async def RunSessionSlot(
+    config: dict,
+    games: asyncio.Queue,
+    executor: ProcessPoolExecutor,
+    browser: bool,
+    recordFile: str,
+    results: list) -> None:
+    """
+    Plays games from the queue one after another, reusing one browser if browsers are used.
+
+    Args:
+        config: The configuration dict.
+        games: The queue of the test numbers and seeds of the games to play.
+        executor: The pool of search workers.
+        browser: True to play in a headless browser, False to play on the simulator.
+        recordFile: The filepath to the csv file the games are appended to.
+        results: The list the record data of each game is added to.
+    """
+
+    driver = await asyncio.to_thread(CreateBrowser) if browser else None
+    try:
+        while not games.empty():
+            testNumber, seed = games.get_nowait()
+            if browser:
+                session = BrowserSession(config, driver, seed)
+                await session.Start()
+            else:
+                session = SimulatedSession(config, seed)
+            data = await PlaySession(session, executor)
+            data['test no.'] = testNumber
+            data['seed'] = seed
+            AppendRecordData(recordFile, data)
+            logging.info(
+                f"Game {testNumber} (seed {seed}): score {data['score']}, "
+                f"highest tile {data['highest value']}, {data['total moves']} moves."
+            )
+            results.append(data)
+    finally:
+        if driver is not None:
+            await asyncio.to_thread(driver.quit)
+
+async def RunSessions(
+    config: dict,
+    games: int,
+    sessions: int,
+    workers: int,
+    seed: int,
+    browser: bool,
+    recordFile: str) -> list:
+    """
+    Plays games in concurrent sessions which share one pool of search workers.
+
+    Args:
+        config: The configuration dict.
+        games: The number of games to play.
+        sessions: The number of games played at once.
+        workers: The number of search worker processes.
+        seed: The seed of the first game. Game n is seeded with seed + n - 1.
+        browser: True to play in headless browsers, False to play on the simulator.
+        recordFile: The filepath to the csv file the games are appended to.
+
+    Returns:
+        The list of the record data of every game, in the order they finished.
+    """
+
+    gameQueue = asyncio.Queue()
+    for testNumber in range(1, games + 1):
+        gameQueue.put_nowait((testNumber, seed + testNumber - 1))
+    results = []
+    # Build and save any missing tables once, rather than in every worker at once.
+    LoadRowTables(config['heuristictables'])
+    with ProcessPoolExecutor(max_workers=workers, initializer=InitialiseWorker, initargs=(config,)) as executor:
+        await asyncio.gather(*(
+            RunSessionSlot(config, gameQueue, executor, browser, recordFile, results)
+            for _ in range(sessions)
+        ))
+    return results
+
+def GetArguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Returns:
+        The parsed arguments.
+    """
+
+    parser = argparse.ArgumentParser(description="Plays many games at once with a shared pool of search workers.")
+    parser.add_argument('config', help="The filepath to the config file.")
+    parser.add_argument('--games', type=int, default=32, help="The number of games to play.")
+    parser.add_argument('--sessions', type=int, default=8, help="The number of games played at once.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="The number of search worker processes.")
+    parser.add_argument('--seed', type=int, default=0, help="The seed of the first game.")
+    parser.add_argument('--browser', action='store_true', help="Plays in headless browsers instead of the simulator.")
+    parser.add_argument('--recordfile', help="Overrides the record file in the config file.")
+    return parser.parse_args()
+
+def main():
+    arguments = GetArguments()
+    config = ReadConfigFile(arguments.config)
+    recordFile = arguments.recordfile or config['recordfile']
+
+    startTime = time.perf_counter()
+    results = asyncio.run(RunSessions(
+        config,
+        arguments.games,
+        arguments.sessions,
+        arguments.workers,
+        arguments.seed,
+        arguments.browser,
+        recordFile
+    ))
+    elapsedTime = time.perf_counter() - startTime
+    if not results: return
+    scores = [data['score'] for data in results]
+    totalMoves = sum(data['total moves'] for data in results)
+    print(f"Played {len(results)} games in {elapsedTime:.1f}s ({totalMoves / elapsedTime:.0f} moves/s).")
+    print(f"Mean score: {sum(scores) / len(scores):.1f}, best score: {max(scores)}")
+
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Description:
+    - Searches the subtrees below the root moves in a pool of worker processes.
+    - Workers are sent packed boards rather than GameState trees and each keeps its own
+      Agent, so its heuristic score table carries over between turns.
+    - The pool is created once and reused for every turn.
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import bitboard
+import gridboard
+
+# The Agent in each worker process, created by InitialiseWorker.
+WORKER_AGENT = None
+
+
+def InitialiseWorker(heuristic: str, tableSize: int) -> None:
+    """
+    Creates the Agent used by a worker process.
+
+    Args:
+        heuristic: The name of the heuristic used to score the leaves.
+        tableSize: The size of the worker's transposition tables, 0 to disable them.
+    """
+
+    global WORKER_AGENT
+    # Imported here as agent.py imports this module.
+    from agent import Agent
+    WORKER_AGENT = Agent(0, lazy=True, tableSize=tableSize, heuristic=heuristic)
+
+def SearchSubtree(board: object, depth: int) -> float:
+    """
+    Finds the smallest leaf score below a packed board in a worker process.
+
+    Args:
+        board: The packed board from bitboard.py or gridboard.py.
+        depth: The number of moves to search below the board.
+
+    Returns:
+        The smallest leaf score or infinity if there are no leaves.
+    """
+
+    engine = gridboard if isinstance(board, tuple) else bitboard
+    return WORKER_AGENT.GetSubtreeScore(engine.DecodeBoard(board), depth)
+
+def GetEngine(array: np.array) -> object:
+    """
+    Gets the packed board engine for a board.
+
+    Args:
+        array: The board as a 2D-array of tile values.
+
+    Returns:
+        The bitboard or gridboard module, or None if the board cannot be packed.
+    """
+
+    if bitboard.CanEncode(array): return bitboard
+    if gridboard.CanEncode(array): return gridboard
+    return None
+
+
+class ParallelSearch:
+    """
+    Class to represent a pool of worker processes searching the game tree.
+
+    The tree is split at splitDepth: every board at that depth is searched by a worker
+    and the results are reduced to a score for each root move in the main process.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        splitDepth: int = 1,
+        heuristic: str = 'DifferenceInLog2',
+        tableSize: int = 0) -> None:
+        self.workers = workers
+        self.splitDepth = splitDepth
+        self.__executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=InitialiseWorker,
+            initargs=(heuristic, tableSize)
+        )
+
+    def ScoreRootMoves(self, array: np.array, maxDepth: int, engine: object) -> dict:
+        """
+        Finds the smallest leaf score below each root move.
+
+        Args:
+            array: The board as a 2D-array of tile values.
+            maxDepth: The depth of the tree.
+            engine: The packed board engine, from GetEngine.
+
+        Returns:
+            A dict of the score of each move that changes the board, in move order.
+        """
+
+        root = engine.EncodeBoard(array)
+        # Bitboard children are exact for two moves from a board with no tile of 2 ** 15.
+        splitDepth = max(1, min(self.splitDepth, maxDepth, 2))
+        rootScores = {}
+        # The boards at the split depth, with the root move each is reached from.
+        frontier = []
+        for move in range(4):
+            child = engine.MoveBoard(root, move)
+            # Moves which change nothing are not searched, as with GameState.
+            if child == root: continue
+            rootScores[move] = math.inf
+            frontier.append((move, child))
+        if splitDepth == 2:
+            frontier = [
+                (move, child)
+                for move, board in frontier
+                for child in (engine.MoveBoard(board, childMove) for childMove in range(4))
+                if child != board
+            ]
+        futures = [
+            (move, self.__executor.submit(SearchSubtree, board, maxDepth - splitDepth))
+            for move, board in frontier
+        ]
+        for move, future in futures:
+            rootScores[move] = min(rootScores[move], future.result())
+        return rootScores
+
+    def Shutdown(self) -> None:
+        """
+        Stops the worker processes.
+        """
+
+        self.__executor.shutdown()
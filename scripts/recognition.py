@@ -0,0 +1,198 @@
+"""
+Description:
+    - Reads the tile values from an image of the board by the colors of the tiles.
+    - Needs no screen, mouse or keyboard, so boards can be read from recorded images.
+"""
+
+import math
+from statistics import mode
+import numpy as np
+from PIL import Image
+from streamio import AppendColorFile
+
+
+def ReadBoardImage(config: dict, colorList: list, image: Image):
+    """
+    Reads the tile values from an image of the game board.
+    
+    Args:
+        config: (dict) The config of the app.
+        colorList: The list of all known colors.
+        image: The image of the board to read.
+
+    Returns:
+        A 2D-list of a integer representation of the current game state.
+        A 2D-list of the read tile colors.
+    """
+
+    # Divide up image
+    dividedImage = DivideImage(image, config)
+    # Get list of numbers
+    gridsize = config['2048']['gridsize']
+    tileNumberList = [[0 for i in range(gridsize)] for j in range(gridsize)]
+    tileColorList = [[0 for i in range(gridsize)] for j in range(gridsize)]
+    for j in range(gridsize):
+        for i in range(gridsize):
+            # logging.debug(f'j:{j + 1}, i:{i + 1}')
+            sampleImage = dividedImage[j][i]
+            tileNumberList[j][i], tileColorList[j][i] = GetTileNumber(
+                sampleImage,
+                colorList,
+                config['knn']
+            )
+    # logging.debug('If the following correct?')
+    # print(np.array(tileNumberList))
+    # response = input("Y/N?:\t").lower() == "y"
+    # if not response:
+    #     print("location?")
+    #     x = int(input("X:\t")) - 1
+    #     y = int(input("Y:\t")) - 1
+    #     sampleImage = dividedImage[y][x]
+    #     tileNumberList[y][x], tileColorList[y][x] = GetTileNumber(
+    #         sampleImage,
+    #         colorList,
+    #         config['knn'],
+    #         record=True,
+    #         filepath=config['colors']
+    #     )
+    # else:
+    #     for j in range(gridsize):
+    #         for i in range(gridsize):
+    #             tempTuple = (
+    #                 tileNumberList[j][i],
+    #                 tileColorList[j][i]
+    #             )
+    #             if tempTuple not in colorList:
+    #                 colorList.append(tempTuple)
+    #                 AppendColorFile(config['colors'],{
+    #                     'number': tileNumberList[j][i],
+    #                     'r': tileColorList[j][i][0],
+    #                     'g': tileColorList[j][i][1],
+    #                     'b': tileColorList[j][i][2]
+    #                 })
+
+
+    return tileNumberList, tileColorList
+
+def DivideImage(image: Image, config: dict) -> list:
+    """
+    Divides up the provided image of 2048 intol 16 smaller images
+    
+    Args:
+        image: The image of 2048.
+        config: The dictionary of configuration values.
+
+    Returns:
+        2D-list of Images.
+    """
+    dividedImage = []
+    gridSize = config["2048"]["gridsize"]
+    # The Width between each numbers box
+    width = math.floor(config["2048"]["size"]["x"] / gridSize)
+    # the hieght between each numbers box
+    height = math.floor(config["2048"]["size"]["y"] / gridSize)
+    # The size of the color sample area
+    sampleBox = config["2048"]["box"]["x"]
+    for y in range(gridSize):
+        dividedRow = []
+        for x in range(gridSize):
+            # left, upper, right, lower bounds
+            tempBoxSize = (x * width, y * height, x * width + sampleBox, y * width + sampleBox)
+            tempImage = image.crop(box=tempBoxSize)
+            # tempImage.show()
+            dividedRow.append(tempImage)
+        dividedImage.append(dividedRow)
+    return dividedImage
+
+def CalculateDistance(color1: dict, color2: dict) -> float:
+    """
+    Calculates the distance between two color values.
+    
+    Args:
+        color1: A dict of rgb color values.
+        color2: A dict of rgb color values.
+    
+    Returns:
+        The distance between the two values.
+    """
+
+    diffR = color1['r'] - color2['r']
+    diffG = color1['g'] - color2['g']
+    diffB = color1['b'] - color2['b']
+    totalSquared = diffR ** 2 + diffG ** 2 + diffB ** 2
+    return float(math.sqrt(totalSquared))
+
+def GetTileNumber(image: Image, colorList: list, K: int  = 3, record: bool = False, filepath: str = None) -> int:
+    """
+    Gets the background color of the image.
+
+    Args:
+        image: The image to find the color in.
+        colorConfig: The color configuration dict.
+        margin: The color value margin or error.
+        filepath: The filepath to the color csv file.
+
+    Returns:
+        The number in the tile.
+        The np.array of the color values.
+    """
+
+    try:
+        color = GetColorValue(image)
+        color = list(color.values())
+        distances = []
+        for number, colorCode in colorList:
+            dist = np.linalg.norm(np.array(color) - np.array(colorCode))
+            distances.append((number, dist))
+        distances.sort(key = lambda x: x[1])
+        topK = distances[:K][0]
+        top = mode(topK)
+        if record: raise ValueError
+    # logging.debug(f"top: {top}")
+    # number = int(input("What is the actual Number:\t"))
+    # if number != top:
+    #     return number
+        return top, color
+    except:
+        if record:
+            number = int(input("Correct Value:\t"))
+            AppendColorFile(filepath,{
+                'number': number,
+                'r': color[0],
+                'g': color[1],
+                'b': color[2]
+            })
+            colorList.append((
+                number,
+                color
+            ))
+            return number, color
+        return 0, color
+
+def GetColorValue(image: Image) -> dict:
+    """
+    Gets the average RGB values for the past in image.
+    
+    Args:
+        image: The image to get the RGB values from.
+        
+    Returns:
+        A dict of the R,G,B values.
+    """
+
+    # image.show()
+    colors = image.getcolors()
+    #colors = [color for color in colors if (color[-1][0] < upperWeight or color[-1][1] < upperWeight or color[-1][2] < upperWeight)]
+    finalColor = [0, 0, 0]
+    for color in colors:
+        finalColor[0] += color[-1][0]
+        finalColor[1] += color[-1][1]
+        finalColor[2] += color[-1][2]
+    finalColor[0] /= len(colors)
+    finalColor[1] /= len(colors)
+    finalColor[2] /= len(colors)
+    return {
+        "r": math.floor(finalColor[0]),
+        "g": math.floor(finalColor[1]),
+        "b": math.floor(finalColor[2])
+    }
@@ -0,0 +1,255 @@
+"""
+Description:
+    - Picks the most likely true board when the board read from the screen does not match
+      the board the agent predicted.
+    - The true board is the predicted board with one spawned tile, so every possible
+      spawn is scored by how well the read tile colors match it.
+    - Finds the tiles whose colors are close to more than one value, so they can be
+      relabelled later.
+    - Corrects the read board with the predicted board and learns the colors of the
+      tiles it corrects.
+"""
+
+import logging
+import math
+
+import numpy as np
+
+from streamio import AppendColorFile
+
+# The color distance given to a tile value with no known colors which was not read.
+UNKNOWN_COLOR_DISTANCE = 100.0
+SPAWN_PROBABILITIES = ((2, 0.9), (4, 0.1))
+
+
+def GetColorDistances(color: list, colorList: list) -> dict:
+    """
+    Finds the distance from a color to the nearest known color of each tile value.
+
+    Args:
+        color: The r, g, b values of the read color.
+        colorList: The list of known colors.
+
+    Returns:
+        A dict of the smallest distance to each tile value.
+    """
+
+    distances = {}
+    color = np.array(color, dtype=float)
+    for number, colorCode in colorList:
+        distance = float(np.linalg.norm(color - np.array(colorCode, dtype=float)))
+        if distance < distances.get(number, math.inf):
+            distances[number] = distance
+    return distances
+
+def GetTileCost(distances: dict, readValue: int, value: int) -> float:
+    """
+    Gets the cost of a tile holding a value.
+
+    Args:
+        distances: The distances of the tile's color to each tile value.
+        readValue: The value the tile was read as.
+        value: The value to cost.
+
+    Returns:
+        The color distance to the value, or if the value has no known colors, 0 if it was
+        read and UNKNOWN_COLOR_DISTANCE otherwise.
+    """
+
+    if value in distances: return distances[value]
+    return 0.0 if value == readValue else UNKNOWN_COLOR_DISTANCE
+
+def GetTileMargin(distances: dict, value: int) -> float:
+    """
+    Gets how much closer a tile's color is to a value than to any other value.
+
+    Args:
+        distances: The distances of the tile's color to each tile value.
+        value: The value of the tile, which must have known colors.
+
+    Returns:
+        The margin, negative if another value is closer, or infinity if no other value
+        has known colors.
+    """
+
+    otherDistances = [distance for number, distance in distances.items() if number != value]
+    if not otherDistances: return math.inf
+    return min(otherDistances) - distances[value]
+
+def ReconcileBoard(
+    predictedArray: np.ndarray,
+    readArray: list,
+    tileColorList: list,
+    colorList: list,
+    confidenceMargin: float) -> tuple:
+    """
+    Finds the most likely true board, the predicted board with one spawned tile whose
+    tile values best match the read colors.
+
+    Args:
+        predictedArray: The board the agent predicted, before the tile spawned.
+        readArray: The board read from the screen.
+        tileColorList: The read color of each tile.
+        colorList: The list of known colors.
+        confidenceMargin: Tiles whose color is closer than this to a value other than
+            their own are low confidence.
+
+    Returns:
+        np.array of the most likely board, the predicted board if it has no empty tiles.
+        The list of the (y, x) positions of the low confidence tiles.
+    """
+
+    predictedArray = np.asarray(predictedArray, dtype=np.int64)
+    readArray = np.asarray(readArray, dtype=np.int64)
+    height, width = predictedArray.shape
+    distances = [[GetColorDistances(tileColorList[y][x], colorList) for x in range(width)] for y in range(height)]
+    costs = np.array([
+        [GetTileCost(distances[y][x], readArray[y, x], predictedArray[y, x]) for x in range(width)]
+        for y in range(height)
+    ])
+    baseCost = costs.sum()
+
+    bestArray = predictedArray
+    bestCost = math.inf
+    emptyCells = list(zip(*np.nonzero(predictedArray == 0)))
+    for y, x in emptyCells:
+        for value, probability in SPAWN_PROBABILITIES:
+            # Less likely spawns need their colors to match slightly better.
+            cost = baseCost - costs[y, x] + GetTileCost(distances[y][x], readArray[y, x], value)
+            cost -= math.log(probability / len(emptyCells))
+            if cost < bestCost:
+                bestCost = cost
+                bestArray = predictedArray.copy()
+                bestArray[y, x] = value
+
+    lowConfidenceTiles = []
+    for y in range(height):
+        for x in range(width):
+            value = bestArray[y, x]
+            if value in distances[y][x]:
+                lowConfidence = GetTileMargin(distances[y][x], value) < confidenceMargin
+            else:
+                # Values with no known colors can only be trusted if they were read.
+                lowConfidence = value != readArray[y, x]
+            if lowConfidence: lowConfidenceTiles.append((y, x))
+    return bestArray, lowConfidenceTiles
+
+def CompareStates(
+    currentArray: np.ndarray,
+    predictedArray: np.ndarray,
+    tileColorList: list,
+    colorList: list,
+    config: dict) -> None:
+    """
+    Compares the two given arrays.
+    
+    Args:
+        currentArray: The current read array.
+        predictedArray: The AI predicted array.
+        tileColorList: The list of read colors.
+        colorList: The list of known colors.
+    """
+
+    if predictedArray is None: return currentArray
+
+    logging.debug('Predicted Array:')
+    print(predictedArray)
+    logging.debug('Read Array:')
+    print(np.array(currentArray))
+    # if input("Does predicted match screen? [Y/n]\t").lower() == 'n':
+    #     time.sleep(2)
+    #     return currentArray
+    # time.sleep(2)
+
+    if CountTileSpawns(predictedArray, currentArray) > 1:
+        logging.debug("The app believes two tiles have spawned at once. Reconciling the board.")
+        reconciledArray, lowConfidenceTiles = ReconcileBoard(
+            predictedArray,
+            currentArray,
+            tileColorList,
+            colorList,
+            config['confidencemargin']
+        )
+        # Low confidence tiles are saved to be relabelled later instead of stopping the game.
+        for y, x in lowConfidenceTiles:
+            colorCode = tileColorList[y][x]
+            logging.warning(f"Low confidence in tile ({x + 1}, {y + 1}): read {currentArray[y][x]}, using {reconciledArray[y][x]}.")
+            AppendColorFile(config['relabelfile'], {
+                'number': reconciledArray[y][x],
+                'r': colorCode[0],
+                'g': colorCode[1],
+                'b': colorCode[2]
+            })
+        currentArray = reconciledArray.tolist()
+
+    height, width = predictedArray.shape
+    for y in range(height):
+        for x in range(width):
+            if predictedArray[y][x] != currentArray[y][x]:
+                if currentArray[y][x] <= 4 and predictedArray[y][x] == 0: continue
+                colorCode = tileColorList[y][x]
+                if not IsColorInColorList(colorCode, colorList):
+                    AppendColorFile(config['colors'], {
+                        'number': predictedArray[y][x],
+                        'r': colorCode[0],
+                        'g': colorCode[1],
+                        'b': colorCode[2]
+                    })
+                    colorList.append((
+                        predictedArray[y][x],
+                        colorCode
+                    ))
+                currentArray[y][x] = predictedArray[y][x]
+            else:
+                if currentArray[y][x] <= 4 and predictedArray[y][x] == 0: continue
+                colorCode = tileColorList[y][x]
+                if not IsColorInColorList(colorCode, colorList):
+                    AppendColorFile(config['colors'], {
+                        'number': predictedArray[y][x],
+                        'r': colorCode[0],
+                        'g': colorCode[1],
+                        'b': colorCode[2]
+                    })
+                    colorList.append((
+                        predictedArray[y][x],
+                        colorCode
+                    ))
+    logging.debug('Updated Array:')
+    print(np.array(currentArray))
+    return currentArray
+
+def IsColorInColorList(color: np.ndarray, colorList: list) -> bool:
+    """
+    Checks if a given color is within the list of known colors.
+    
+    Args:
+        color: The color to find.
+        colorList: The list of known colors.
+        
+    Returns:
+        True if color is in the list of known colors.
+    """
+
+    knownColors = [(row[1][0], row[1][1], row[1][2]) for row in colorList]
+    color = (color[0], color[1], color[2])
+    return color in knownColors
+
+def CountTileSpawns(predictedArray: object, readArray: list) -> int:
+    """
+    Counts how many new tiles have been added to the board.
+    
+    Args:
+        predictedArray: What the agent predicted the board would be like.
+        readArray: The data read from the board.
+    
+    Returns:
+        The number of new tiles.
+    """
+
+    height, width = predictedArray.shape
+    count = 0
+    for y in range(height):
+        for x in range(width):
+            if predictedArray[y][x] != readArray[y][x]:
+                count += 1
+    return count
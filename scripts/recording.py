@@ -0,0 +1,149 @@
+"""
+Description:
+    - Records a game session to a zip archive: the image of the board read each turn as a
+      png, the board read from it, the board after CompareStates, the move and the timings.
+    - Writes each turn as soon as it is recorded, so a game which crashes can still be replayed.
+    - Reads the recorded frames back so replay.py can re-run a session without a browser.
+"""
+
+import io
+import json
+import os
+import time
+import zipfile
+
+from PIL import Image
+
+SESSION_FILENAME = 'session.json'
+FRAME_DIRECTORY = 'frames'
+
+
+class SessionRecorder:
+    """
+    Class to write the frames of a game session to a zip archive.
+
+    The settings are written when recording starts and each frame as it is recorded, and
+    the archive is closed after every write, so it can be read however the game ends.
+    """
+
+    def __init__(self, filepath: str, config: dict) -> None:
+        self.filepath = filepath
+        # The settings needed to read the images again.
+        self.config = {'2048': config['2048'], 'knn': config['knn'], 'backend': config['backend']}
+        self.frameCount = 0
+        with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(SESSION_FILENAME, json.dumps({'config': self.config}))
+
+    def AddFrame(
+        self,
+        image: Image,
+        readArray: list,
+        board: list,
+        move: int,
+        readTime: float,
+        searchTime: float) -> None:
+        """
+        Records one turn of the game.
+
+        Args:
+            image: The image of the board, or None if the board was not read from an image.
+            readArray: The board read from the image.
+            board: The board after CompareStates, which the agent searched.
+            move: The move the agent chose, negative if the game is over.
+            readTime: The seconds taken to capture and read the board.
+            searchTime: The seconds taken to choose the move.
+        """
+
+        frameName = f'{FRAME_DIRECTORY}/{self.frameCount:05}'
+        imageName = None if image is None else frameName + '.png'
+        frame = {
+            'image': imageName,
+            'read': [[int(value) for value in row] for row in readArray],
+            'board': [[int(value) for value in row] for row in board],
+            'move': int(move),
+            'readtime': readTime,
+            'searchtime': searchTime
+        }
+        # Reopening the archive rewrites its central directory after the new frame.
+        with zipfile.ZipFile(self.filepath, 'a', zipfile.ZIP_DEFLATED) as archive:
+            if image is not None:
+                imageBuffer = io.BytesIO()
+                image.save(imageBuffer, format='PNG')
+                # The png is already compressed.
+                archive.writestr(imageName, imageBuffer.getvalue(), compress_type=zipfile.ZIP_STORED)
+            archive.writestr(frameName + '.json', json.dumps(frame))
+        self.frameCount += 1
+
+
+def CreateRecorder(config: dict) -> SessionRecorder:
+    """
+    Creates a recorder for a new session in the session directory if sessions are recorded.
+
+    Args:
+        config: The configuration dict.
+
+    Returns:
+        The SessionRecorder, or None if 'recordsession' is false.
+    """
+
+    if not config['recordsession']: return None
+    os.makedirs(config['sessiondirectory'], exist_ok=True)
+    filepath = os.path.join(config['sessiondirectory'], time.strftime('session-%Y%m%d-%H%M%S.zip'))
+    return SessionRecorder(filepath, config)
+
+def ReadSession(filepath: str) -> tuple:
+    """
+    Reads the details of a recorded session.
+
+    Args:
+        filepath: The filepath to the session archive.
+
+    Returns:
+        The dict of the settings the session was recorded with.
+        The list of frame dicts.
+    """
+
+    with zipfile.ZipFile(filepath) as archive:
+        session = json.loads(archive.read(SESSION_FILENAME))
+        frames = ReadFrameList(archive, session)
+    return session['config'], frames
+
+def ReadFrameList(archive: zipfile.ZipFile, session: dict) -> list:
+    """
+    Reads the frame dicts of a session in the order they were recorded.
+
+    Args:
+        archive: The open session archive.
+        session: The dict read from the session file.
+
+    Returns:
+        The list of frame dicts.
+    """
+
+    # Sessions recorded before frames were written one at a time keep them in the session file.
+    if 'frames' in session: return session['frames']
+    frameNames = sorted(
+        name for name in archive.namelist()
+        if name.startswith(FRAME_DIRECTORY + '/') and name.endswith('.json')
+    )
+    return [json.loads(archive.read(name)) for name in frameNames]
+
+def ReadFrames(filepath: str):
+    """
+    Reads the frames of a recorded session one at a time.
+
+    Args:
+        filepath: The filepath to the session archive.
+
+    Yields:
+        The frame dict and its image, or None if the frame has no image.
+    """
+
+    with zipfile.ZipFile(filepath) as archive:
+        for frame in ReadFrameList(archive, json.loads(archive.read(SESSION_FILENAME))):
+            if frame['image'] is None:
+                yield frame, None
+                continue
+            with Image.open(io.BytesIO(archive.read(frame['image']))) as image:
+                image.load()
+                yield frame, image
@@ -0,0 +1,213 @@
+"""
+Description:
+    - Replays recorded game sessions through ReadBoardImage, CompareStates and the agent
+      as fast as possible, with no browser, screen or keyboard.
+    - Replays the sessions across a pool of processes.
+    - Measures how many tiles and boards are read correctly, how often the agent chooses
+      the recorded move and how long each step takes.
+
+Usage:
+    python scripts/replay.py config/appsettings.json test/sessions --workers 4
+"""
+
+import argparse
+import contextlib
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from agent import CreateAgent
+from heuristics import LoadRowTables
+from gridboard import SetCacheDirectory
+from reconcile import CompareStates
+from recognition import ReadBoardImage
+from recording import ReadSession, ReadFrames
+from state import MoveBoards
+from streamio import ReadConfigFile, ReadColorFile
+
+
+def InitialiseWorker(config: dict) -> None:
+    """
+    Loads the heuristic and move tables in a worker process. The parent has already
+    built any missing tables and saved them to the cache file.
+
+    Args:
+        config: The configuration dict.
+    """
+
+    # The low confidence tiles CompareStates warns about are counted in the results instead.
+    logging.disable(logging.WARNING)
+    LoadRowTables(config['heuristictables'], save=False)
+    SetCacheDirectory(config['rowtables'])
+
+def ReplaySession(config: dict, filepath: str) -> dict:
+    """
+    Replays a recorded session. The recorded board after CompareStates is taken as the
+    true board, and the board the agent predicts is made with the recorded move so the
+    replay follows the recorded game.
+
+    Args:
+        config: The configuration dict.
+        filepath: The filepath to the session archive.
+
+    Returns:
+        A dict of the accuracy and timings of the replay.
+    """
+
+    sessionConfig, _ = ReadSession(filepath)
+    colorList = ReadColorFile(config['colors'])
+    # New colors are learnt in memory only, so replays do not change the color files.
+    config = dict(config, colors=os.devnull, relabelfile=os.devnull)
+    config.update(sessionConfig)
+    agent = CreateAgent(config)
+
+    result = {
+        'session': filepath,
+        'frames': 0,
+        'tiles': 0,
+        'correct tiles': 0,
+        'correct boards': 0,
+        'matched moves': 0,
+        'read time': 0.0,
+        'compare time': 0.0,
+        'search time': 0.0
+    }
+    predictedArray = None
+    startTime = time.perf_counter()
+    # CompareStates prints every board.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for frame, image in ReadFrames(filepath):
+            stepTime = time.perf_counter()
+            if image is None:
+                tileNumberList = [row[:] for row in frame['read']]
+            else:
+                tileNumberList, tileColorList = ReadBoardImage(config, colorList, image)
+            result['read time'] += time.perf_counter() - stepTime
+            correctTiles = int((np.array(tileNumberList) == np.array(frame['board'])).sum())
+            result['tiles'] += np.size(frame['board'])
+            result['correct tiles'] += correctTiles
+            result['correct boards'] += correctTiles == np.size(frame['board'])
+
+            stepTime = time.perf_counter()
+            if image is not None:
+                tileNumberList = CompareStates(tileNumberList, predictedArray, tileColorList, colorList, config)
+            result['compare time'] += time.perf_counter() - stepTime
+
+            stepTime = time.perf_counter()
+            nextMove = agent.GetNextMove(tileNumberList)
+            result['search time'] += time.perf_counter() - stepTime
+            result['matched moves'] += int(nextMove == frame['move'])
+            result['frames'] += 1
+            if frame['move'] < 0:
+                break
+            predictedArray = MoveBoards(np.array(frame['board'])[None], frame['move'])[0][0]
+    agent.Close()
+    result['total time'] = time.perf_counter() - startTime
+    return result
+
+def ReplaySessions(config: dict, filepaths: list, workers: int) -> list:
+    """
+    Replays sessions across a process pool.
+
+    Args:
+        config: The configuration dict.
+        filepaths: The filepaths to the session archives.
+        workers: The number of worker processes.
+
+    Returns:
+        The list of the results of every replay, in the order they finished.
+    """
+
+    # Each session is searched in a single process so the sessions scale across the cores.
+    config = dict(config, workers=0)
+    # Build and save any missing tables once, rather than in every worker at once.
+    LoadRowTables(config['heuristictables'])
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=InitialiseWorker, initargs=(config,)) as executor:
+        futures = [executor.submit(ReplaySession, config, filepath) for filepath in filepaths]
+        for future in as_completed(futures):
+            result = future.result()
+            PrintResult(result)
+            results.append(result)
+    return results
+
+def PrintResult(result: dict) -> None:
+    """
+    Prints the accuracy and timings of a replay.
+
+    Args:
+        result: The result of ReplaySession, or the totals of several.
+    """
+
+    frames = max(result['frames'], 1)
+    print(
+        f"{result['session']}: {result['frames']} frames in {result['total time']:.2f}s "
+        f"({result['frames'] / max(result['total time'], 1e-9):.1f} frames/s), "
+        f"tiles {result['correct tiles']}/{result['tiles']}, "
+        f"boards {result['correct boards']}/{result['frames']}, "
+        f"moves {result['matched moves']}/{result['frames']}, "
+        f"read {result['read time'] / frames * 1000:.2f}ms, "
+        f"compare {result['compare time'] / frames * 1000:.2f}ms, "
+        f"search {result['search time'] / frames * 1000:.2f}ms per frame"
+    )
+
+def GetSessionFiles(paths: list) -> list:
+    """
+    Lists the session archives, looking inside any directories.
+
+    Args:
+        paths: The filepaths to session archives or directories of them.
+
+    Returns:
+        The sorted list of session archive filepaths.
+    """
+
+    filepaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            filepaths.extend(glob.glob(os.path.join(path, '*.zip')))
+        else:
+            filepaths.extend(glob.glob(path))
+    return sorted(filepaths)
+
+def GetArguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Returns:
+        The parsed arguments.
+    """
+
+    parser = argparse.ArgumentParser(description="Replays recorded game sessions and measures recognition and search.")
+    parser.add_argument('config', help="The filepath to the config file.")
+    parser.add_argument('sessions', nargs='+', help="The session archives, or directories of them.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="The number of worker processes.")
+    return parser.parse_args()
+
+def main():
+    arguments = GetArguments()
+    config = ReadConfigFile(arguments.config)
+    filepaths = GetSessionFiles(arguments.sessions)
+    if not filepaths:
+        print("No sessions found.")
+        return
+
+    startTime = time.perf_counter()
+    results = ReplaySessions(config, filepaths, arguments.workers)
+    elapsedTime = time.perf_counter() - startTime
+    totals = {'session': f"{len(results)} sessions"}
+    for key in results[0]:
+        if key != 'session': totals[key] = sum(result[key] for result in results)
+    # The wall time, which is less than the summed time when sessions run in parallel.
+    totals['total time'] = elapsedTime
+    PrintResult(totals)
+
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Description:
+    - Picks moves with Monte Carlo rollouts instead of searching the game tree.
+    - Plays many games forward from each root move to a fixed horizon, spawning random
+      tiles and choosing moves randomly or greedily, and picks the move with the smallest
+      mean heuristic score.
+    - Every rollout step moves and spawns on all the boards at once as NumPy batches.
+"""
+
+import math
+import time
+
+import numpy as np
+
+import heuristics
+import searchstats
+from expectimax import GAME_OVER_PENALTY
+from state import MoveBoards
+
+POLICIES = ('random', 'greedy')
+
+
+def SpawnTiles(arrays: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Places a 2 (probability 0.9) or a 4 on a random empty tile of every board.
+
+    Args:
+        arrays: np.array of shape (N, H, W) of tile values.
+        rng: The random number generator.
+
+    Returns:
+        np.array of the boards with the new tiles. Boards with no empty tiles are unchanged.
+    """
+
+    flat = arrays.reshape(len(arrays), -1).copy()
+    empty = flat == 0
+    # The empty tile with the largest random key is chosen on each board.
+    keys = np.where(empty, rng.random(flat.shape), -1)
+    cells = keys.argmax(axis=1)
+    values = np.where(rng.random(len(flat)) < 0.9, 2, 4)
+    rows = np.nonzero(empty.any(axis=1))[0]
+    flat[rows, cells[rows]] = values[rows]
+    return flat.reshape(arrays.shape)
+
+def PlayRollouts(
+    arrays: np.ndarray,
+    horizon: int,
+    policy: str,
+    rng: np.random.Generator) -> tuple:
+    """
+    Plays a stack of games forward a fixed number of moves.
+
+    Args:
+        arrays: np.array of shape (N, H, W) of the boards after a move, before the tile spawns.
+        horizon: The number of moves to play.
+        policy: 'random' to pick any move which changes the board, 'greedy' to pick the
+            move which gains the most score.
+        rng: The random number generator.
+
+    Returns:
+        np.array of the boards after the last move.
+        np.array of shape (N,) which is True where the game ended before the horizon.
+    """
+
+    if policy not in POLICIES:
+        raise ValueError(f"Invalid rollout policy: {policy}")
+    arrays = np.asarray(arrays, dtype=np.int64)
+    gameOver = np.zeros(len(arrays), dtype=bool)
+    rows = np.arange(len(arrays))
+    stats = searchstats.ACTIVE
+    stats.maxDepth = max(stats.maxDepth, horizon + 1)
+    for _ in range(horizon):
+        arrays = SpawnTiles(arrays, rng)
+        results = [MoveBoards(arrays, move) for move in range(4)]
+        movedArrays = np.stack([result[0] for result in results])
+        changed = np.stack([result[1] for result in results], axis=1)
+        gameOver |= ~changed.any(axis=1)
+        stats.nodesGenerated += int(np.count_nonzero(changed))
+        stats.movesPruned += int(changed.size - np.count_nonzero(changed))
+        if policy == 'greedy':
+            # The random part is below the smallest score difference and only breaks ties.
+            keys = np.stack([result[2] for result in results], axis=1) + rng.random(changed.shape)
+        else:
+            keys = rng.random(changed.shape)
+        moves = np.where(changed, keys, -1).argmax(axis=1)
+        arrays = np.where(gameOver[:, None, None], arrays, movedArrays[moves, rows])
+        if gameOver.all(): break
+    return arrays, gameOver
+
+
+class RolloutSearch:
+    """
+    Class to represent a Monte Carlo rollout search from one board.
+
+    The rollouts of every root move are played as one batch. The score of a rollout is
+    the heuristic score of its last board, plus a penalty if the game ended.
+    """
+
+    def __init__(
+        self,
+        array: np.array,
+        playouts: int,
+        horizon: int,
+        policy: str = 'random',
+        heuristic: str = 'DifferenceInLog2',
+        rng: np.random.Generator = None) -> None:
+        self.array = np.asarray(array, dtype=np.int64)
+        self.playouts = playouts
+        self.horizon = horizon
+        self.policy = policy
+        self.heuristic = heuristic
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # The mean rollout score of each root move, found by FindBestMove.
+        self.moveScores = None
+        self.removedMoves = set()
+
+    def ScoreMoves(self) -> dict:
+        """
+        Plays the rollouts of every root move which changes the board.
+
+        Returns:
+            A dict of the mean rollout score of each move.
+        """
+
+        children = []
+        moves = []
+        for move in range(4):
+            movedArrays, changed, _ = MoveBoards(self.array[None], move)
+            if not changed[0]: continue
+            children.append(movedArrays[0])
+            moves.append(move)
+        if not moves: return {}
+        arrays = np.repeat(np.stack(children), self.playouts, axis=0)
+        arrays, gameOver = PlayRollouts(arrays, self.horizon, self.policy, self.rng)
+        stats = searchstats.ACTIVE
+        startTime = time.perf_counter()
+        scores = heuristics.ScoreBoards(arrays, self.heuristic) + GAME_OVER_PENALTY * gameOver
+        stats.nodesScored += len(arrays)
+        stats.scoringTime += time.perf_counter() - startTime
+        meanScores = scores.reshape(len(moves), self.playouts).mean(axis=1)
+        return dict(zip(moves, meanScores.tolist()))
+
+    def FindBestMove(self) -> int:
+        """
+        Finds the move with the smallest mean rollout score.
+
+        Returns:
+            The best next move or -1 if there are no moves.
+        """
+
+        if self.moveScores is None:
+            self.moveScores = self.ScoreMoves()
+        bestScore = math.inf
+        bestMove = -1
+        for move, score in self.moveScores.items():
+            if move in self.removedMoves: continue
+            if score < bestScore:
+                bestScore = score
+                bestMove = move
+        return bestMove
+
+    def RemoveChild(self, move: int) -> None:
+        """
+        Removes a root move from the search.
+
+        Args:
+            move: The move to remove.
+        """
+
+        self.removedMoves.add(move)
+
+    def GetChildArray(self, move: int) -> np.array:
+        """
+        Gets the board made by performing a move from the root.
+
+        Args:
+            move: The move number.
+
+        Returns:
+            The board as a 2D-array of tile values.
+        """
+
+        return MoveBoards(self.array[None], move)[0][0]
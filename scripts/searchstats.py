@@ -0,0 +1,92 @@
+"""
+Description:
+    - Holds the counters and timers recorded while the agent searches for a move.
+    - The searches record to the module's ACTIVE stats, which the agent swaps for a new
+      SearchStats on every call, so the counters do not need to be passed through the tree.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class SearchStats:
+    """
+    Class to represent the work done by one or more searches.
+
+    Expansion time is the time spent generating states. Scoring time is the time spent
+    scoring leaves. Search time is the rest of the call, spent walking the tree to find
+    the best move. Work done in the worker processes of a parallel search is not counted.
+    """
+
+    COUNTERS = ('calls', 'nodesGenerated', 'nodesScored', 'movesPruned', 'duplicatesShared')
+    TIMERS = ('expansionTime', 'scoringTime', 'searchTime', 'totalTime')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.nodesGenerated = 0
+        self.nodesScored = 0
+        # Moves which changed nothing, so no child was generated.
+        self.movesPruned = 0
+        # Children taken from the transposition table instead of being generated.
+        self.duplicatesShared = 0
+        self.maxDepth = 0
+        self.expansionTime = 0.0
+        self.scoringTime = 0.0
+        self.searchTime = 0.0
+        self.totalTime = 0.0
+
+    def __repr__(self) -> str:
+        return f"SearchStats({self.ToDict()})"
+
+    def Add(self, other) -> None:
+        """
+        Adds the counters and timers of another SearchStats to these.
+
+        Args:
+            other: The SearchStats to add.
+        """
+
+        for name in self.COUNTERS + self.TIMERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.maxDepth = max(self.maxDepth, other.maxDepth)
+
+    def ToDict(self) -> dict:
+        """
+        Gets the counters and timers.
+
+        Returns:
+            A dict of every counter and timer, with the times in seconds.
+        """
+
+        values = {name: getattr(self, name) for name in self.COUNTERS}
+        values['maxDepth'] = self.maxDepth
+        values.update({name: getattr(self, name) for name in self.TIMERS})
+        return values
+
+
+# The stats the running search records to.
+ACTIVE = SearchStats()
+
+@contextmanager
+def Recording(stats: SearchStats):
+    """
+    Records a search to the given stats, timing the whole search.
+
+    Args:
+        stats: The SearchStats to record to.
+
+    Yields:
+        The stats.
+    """
+
+    global ACTIVE
+    previousStats = ACTIVE
+    ACTIVE = stats
+    startTime = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.calls += 1
+        stats.totalTime += time.perf_counter() - startTime
+        stats.searchTime = max(0.0, stats.totalTime - stats.expansionTime - stats.scoringTime)
+        ACTIVE = previousStats
@@ -0,0 +1,147 @@
+"""
+Description:
+    - Plays 2048 in process without a browser, screen or keyboard.
+    - Spawns tiles with a seeded random number generator so games can be repeated.
+    - Provides GetBoardImage, GetInformation and PressKey in the same form as interface.py,
+      so the agent plays it with the same loop in game.py as the browser game.
+"""
+
+import logging
+
+import numpy as np
+
+from game import PlayGame
+from state import MoveBoards
+
+
+class Simulator:
+    """
+    Class to represent a game of 2048.
+
+    Moves are performed with state.MoveBoards, so they match the moves of GameState. A
+    new tile spawns after every move which changes the board: a 2 with probability 0.9,
+    otherwise a 4, on an empty tile chosen uniformly.
+    """
+
+    def __init__(self, gridSize: int = 4, seed: int = None) -> None:
+        self.gridSize = gridSize
+        self.rng = np.random.default_rng(seed)
+        self.array = np.zeros((gridSize, gridSize), dtype=np.int64)
+        # The game score, the sum of the values of the tiles created by combining.
+        self.score = 0
+        self.moveCount = 0
+        self.SpawnTile()
+        self.SpawnTile()
+
+    def SpawnTile(self) -> bool:
+        """
+        Places a new tile on a random empty tile.
+
+        Returns:
+            True if there was an empty tile.
+        """
+
+        emptyCells = np.flatnonzero(self.array == 0)
+        if not len(emptyCells): return False
+        cell = self.rng.choice(emptyCells)
+        self.array.flat[cell] = 2 if self.rng.random() < 0.9 else 4
+        return True
+
+    def Move(self, move: int) -> bool:
+        """
+        Performs a move and spawns a new tile if the move changed the board.
+
+        Args:
+            move: integer representing the move.
+                0 - Up,
+                1 - Right,
+                2 - Down,
+                3 - Left
+
+        Returns:
+            True if the move changed the board.
+        """
+
+        movedArrays, changed, scores = MoveBoards(self.array[None], move)
+        if not changed[0]: return False
+        self.array = movedArrays[0]
+        self.score += int(scores[0])
+        self.moveCount += 1
+        self.SpawnTile()
+        return True
+
+    def IsGameOver(self) -> bool:
+        """
+        Checks if no move changes the board.
+
+        Returns:
+            True if the game is over.
+        """
+
+        if not self.array.all(): return False
+        return not any(MoveBoards(self.array[None], move)[1][0] for move in range(4))
+
+    def GetBoardImage(self, config: dict) -> None:
+        """
+        Gets the image of the board, which is never needed as the board is read directly.
+
+        Args:
+            config: The configuration dict.
+
+        Returns:
+            None.
+        """
+
+        return None
+
+    def GetInformation(self, config: dict, colorList: list, image: object = None) -> tuple:
+        """
+        Reads the board, in the same form as interface.GetInformation.
+
+        Args:
+            config: The configuration dict, unused as the board is read directly.
+            colorList: The list of all known colors, unused as no colors are read.
+            image: Unused, as the board is read directly.
+
+        Returns:
+            A 2D-list of the tile values.
+            A 2D-list of tile colors, all None as no image is read.
+        """
+
+        tileNumberList = self.array.tolist()
+        tileColorList = [[None] * self.gridSize for _ in range(self.gridSize)]
+        return tileNumberList, tileColorList
+
+    def PressKey(self, keyNum: int) -> None:
+        """
+        Enters up, down, left, or right, in the same form as interface.PressKey.
+
+        Args:
+            keyNum: integer representing the key to be pressed.
+        """
+
+        if keyNum not in (0, 1, 2, 3):
+            raise ValueError(f"Invalid key: {keyNum}")
+        # The game on the screen would wait forever for a move which changes nothing.
+        if not self.Move(keyNum):
+            raise ValueError(f"The agent chose move {keyNum}, which does not change the board.")
+
+
+def PlayHeadlessGame(config: dict, seed: int = None) -> dict:
+    """
+    Plays a game on the simulator with game.PlayGame until the agent finds no move. There
+    is no animation to wait for, so the turn delay is skipped.
+
+    Args:
+        config: The configuration dict.
+        seed: The seed of the tile spawns.
+
+    Returns:
+        A dict of the record data of the game and the game score.
+    """
+
+    simulator = Simulator(config['2048']['gridsize'], seed)
+    data = PlayGame(dict(config, turndelay=0), [], simulator)
+    logging.debug(f"Headless game over after {simulator.moveCount} moves with a score of {simulator.score}.")
+    data['game score'] = simulator.score
+    return data
@@ -1,28 +1,78 @@
-from itertools import combinations
-import math
-from turtle import width
+import time
 import numpy as np
 
+import bitboard
+import gridboard
+import heuristics
+import searchstats
+from cache import BoardKey, TranspositionTable
+
 class GameState:
     """
     Class to represent a game state.
+
+    In lazy mode the children are not generated when the state is constructed. They are
+    generated one at a time by IterateChildren when the search asks for them, and are not
+    kept by the state, so subtrees the search discards are never held in memory.
+
+    If a transposition table is given, children with the same board at the same depth are
+    shared, so duplicate positions are only expanded once.
     """
 
-    def __init__(self, array: np.array, maxDepth: int, depth: int = 0) -> None:
-        self.array = array
+    def __init__(
+        self,
+        array: np.array,
+        maxDepth: int,
+        depth: int = 0,
+        board: object = None,
+        lazy: bool = False,
+        table: TranspositionTable = None,
+        heuristic: str = 'DifferenceInLog2') -> None:
+        self.__array = array
+        # Packed board used for move generation. 4x4 boards are packed into a 64-bit int by
+        # bitboard.py, other square boards into a tuple of rows by gridboard.py.
+        if board is None:
+            if bitboard.CanEncode(array):
+                board = bitboard.EncodeBoard(array)
+            elif gridboard.CanEncode(array):
+                board = gridboard.EncodeBoard(array)
+        self.board = board
+        # The module which performs moves on the packed board.
+        self.engine = None
+        if board is not None:
+            self.engine = gridboard if isinstance(board, tuple) else bitboard
         self.depth = depth
         self.maxDepth = maxDepth
         self.__score = None
-        if depth < maxDepth:
+        self.lazy = lazy
+        self.table = table
+        # The name of the heuristic in heuristics.py used to score the state.
+        self.heuristic = heuristic
+        # Moves removed from a lazy state, which has no children list to remove them from.
+        self.__removedMoves = set()
+        stats = searchstats.ACTIVE
+        stats.nodesGenerated += 1
+        if depth > stats.maxDepth: stats.maxDepth = depth
+        if depth < maxDepth and not lazy:
             self.children = self.GenerateChildren()
 
+    @property
+    def array(self) -> np.array:
+        """
+        The board as a 2D-array of tile values.
+        """
+
+        if self.__array is None:
+            self.__array = self.engine.DecodeBoard(self.board)
+        return self.__array
+
     @property
     def score(self):
         """
         Score of the state.
         """
 
-        if self.__score: return self.__score
+        if self.__score is not None: return self.__score
 
         self.__score = self.CalculateScore()
         return self.__score
@@ -31,6 +81,16 @@ class GameState:
     def score(self, value: int):
         self.__score = value
 
+    def HasScore(self) -> bool:
+        """
+        Checks if the state's score has already been calculated.
+
+        Returns:
+            True if the score is known.
+        """
+
+        return self.__score is not None
+
     def GenerateChildren(self):
         """
         Generates the four possible child states.
@@ -39,12 +99,135 @@ class GameState:
             A dict of all the possible child states.
         """
 
-        return [
+        children = [
             self.GenerateUpChild(),
             self.GenerateRightChild(),
             self.GenerateDownChild(),
             self.GenerateLeftChild()
         ]
+        searchstats.ACTIVE.movesPruned += children.count(None)
+        return children
+
+    def GetKey(self, table: TranspositionTable = None) -> object:
+        """
+        Gets the key of the state's board for use in a TranspositionTable.
+
+        Args:
+            table: The table the key is for. If the table is canonical, the canonical key is used.
+
+        Returns:
+            The board key.
+        """
+
+        if table is not None:
+            return table.MakeKey(self.__array, self.board)
+        return BoardKey(self.__array, self.board)
+
+    def CreateChild(self, array: np.array, board: object = None):
+        """
+        Creates a child state, reusing the state from the transposition table if there is one.
+
+        Args:
+            array: The child's board as a 2D-array of tile values.
+            board: The child's packed board, if there is one.
+
+        Returns:
+            The child state.
+        """
+
+        # The root's children are never shared so each move keeps its own orientation.
+        if self.table is None or (self.depth == 0 and self.table.canonical):
+            return GameState(
+                array,
+                self.maxDepth,
+                depth=self.depth + 1,
+                board=board,
+                lazy=self.lazy,
+                table=self.table,
+                heuristic=self.heuristic
+            )
+        key = (self.table.MakeKey(array, board), self.depth + 1)
+        child = self.table.Get(key)
+        if child is None:
+            child = GameState(
+                array,
+                self.maxDepth,
+                depth=self.depth + 1,
+                board=board,
+                lazy=self.lazy,
+                table=self.table,
+                heuristic=self.heuristic
+            )
+            self.table.Put(key, child)
+        else:
+            searchstats.ACTIVE.duplicatesShared += 1
+        return child
+
+    def IsLeaf(self) -> bool:
+        """
+        Checks if the state is at the maximum depth of the tree.
+
+        Returns:
+            True if the state has no children.
+        """
+
+        return self.depth >= self.maxDepth
+
+    def GetChild(self, move: int):
+        """
+        Gets the child state for the given move, generating it if the state is lazy.
+
+        Args:
+            move: integer representing the move.
+
+        Returns:
+            The child state or None if the move changes nothing.
+        """
+
+        if self.IsLeaf() or move in self.__removedMoves: return None
+        if hasattr(self, 'children'):
+            return self.children[move]
+        stats = searchstats.ACTIVE
+        startTime = time.perf_counter()
+        child = self.GenerateChild(move)
+        stats.expansionTime += time.perf_counter() - startTime
+        if child is None: stats.movesPruned += 1
+        return child
+
+    def IterateChildren(self):
+        """
+        Iterates over the possible child states. Lazy states generate each child when it is reached.
+
+        Yields:
+            The move and the child state for each move that changes the board.
+        """
+
+        if self.IsLeaf(): return
+        for move in range(4):
+            child = self.GetChild(move)
+            if child is None: continue
+            yield move, child
+
+    def GenerateChild(self, move: int):
+        """
+        Generates the child state for the given move.
+
+        Args:
+            move: integer representing the move.
+
+        Returns:
+            The child state.
+        """
+
+        if move == 0:
+            return self.GenerateUpChild()
+        elif move == 1:
+            return self.GenerateRightChild()
+        elif move == 2:
+            return self.GenerateDownChild()
+        elif move == 3:
+            return self.GenerateLeftChild()
+        raise ValueError(f"Invalid move: {move}")
 
     def GenerateUpChild(self):
         """
@@ -53,6 +236,8 @@ class GameState:
         Returns:
             The child state.
         """
+        if self.board is not None:
+            return self.GeneratePackedChild(0)
         # Gets array size
         height, width = self.array.shape
         tempArray = self.array.copy()
@@ -87,7 +272,7 @@ class GameState:
         # Check if child array is the same as parent array
         if np.array_equal(tempArray, self.array):
             return None
-        return GameState(tempArray, self.maxDepth, depth=self.depth + 1)
+        return self.CreateChild(tempArray)
 
     def GenerateRightChild(self):
         """
@@ -96,6 +281,8 @@ class GameState:
         Returns:
             The child state.
         """
+        if self.board is not None:
+            return self.GeneratePackedChild(1)
         # Gets array size
         height, width = self.array.shape
         tempArray = self.array.copy()
@@ -130,7 +317,7 @@ class GameState:
         # Check if child array is the same as parent array
         if np.array_equal(tempArray, self.array):
             return None
-        return GameState(tempArray, self.maxDepth, depth=self.depth + 1)
+        return self.CreateChild(tempArray)
 
     def GenerateDownChild(self):
         """
@@ -139,6 +326,8 @@ class GameState:
         Returns:
             The child state.
         """
+        if self.board is not None:
+            return self.GeneratePackedChild(2)
         # Gets array size
         height, width = self.array.shape
         tempArray = self.array.copy()
@@ -173,7 +362,7 @@ class GameState:
         # Check if child array is the same as parent array
         if np.array_equal(tempArray, self.array):
             return None
-        return GameState(tempArray, self.maxDepth, depth=self.depth + 1)
+        return self.CreateChild(tempArray)
 
     def GenerateLeftChild(self):
         """
@@ -182,6 +371,8 @@ class GameState:
         Returns:
             The child state.
         """
+        if self.board is not None:
+            return self.GeneratePackedChild(3)
         # Gets array size
         height, width = self.array.shape
         tempArray = self.array.copy()
@@ -216,7 +407,31 @@ class GameState:
         # Check if child array is the same as parent array
         if np.array_equal(tempArray, self.array):
             return None
-        return GameState(tempArray, self.maxDepth, depth=self.depth + 1)
+        return self.CreateChild(tempArray)
+
+    def GeneratePackedChild(self, move: int):
+        """
+        Generates the child state for the given move using the packed board engine.
+
+        Args:
+            move: integer representing the move.
+                0 - Up,
+                1 - Right,
+                2 - Down,
+                3 - Left
+
+        Returns:
+            The child state.
+        """
+
+        childBoard = self.engine.MoveBoard(self.board, move)
+        # Check if child board is the same as parent board
+        if childBoard == self.board:
+            return None
+        # Boards holding the largest packable tile continue on the array engine.
+        if self.engine.HasMaxTile(childBoard):
+            return self.CreateChild(self.engine.DecodeBoard(childBoard))
+        return self.CreateChild(None, board=childBoard)
 
     def RemoveChild(self, index: int) -> None:
         """
@@ -226,7 +441,9 @@ class GameState:
             index: The index of the child to remove.
         """
 
-        self.children[index] = None
+        self.__removedMoves.add(index)
+        if hasattr(self, 'children'):
+            self.children[index] = None
 
     def CalculateScore(self) -> int:
         """
@@ -236,7 +453,9 @@ class GameState:
             The score.
         """
 
-        scoresArray = self.DifferenceInLog2()
+        if self.engine is bitboard:
+            return heuristics.ScorePackedBoard(self.board, self.heuristic)
+        scoresArray = heuristics.GetHeuristic(self.heuristic)(self.array)
         return np.sum(scoresArray)
 
     def SumProductOfFourAdjacentTiles(self) -> np.array:
@@ -247,23 +466,7 @@ class GameState:
             np.array of the resulting values.
         """
         
-        sizeY, sizeX = self.array.shape
-        tempArray = np.zeros((sizeY, sizeX))
-        boundY = range(sizeY)
-        boundX = range(sizeX)
-        for y in boundY:
-            for x in boundX:
-                total = 0
-                if x - 1 in boundX:
-                    total += self.array[y][x] * self.array[y][x - 1]
-                if x + 1 in boundX:
-                    total += self.array[y][x] * self.array[y][x + 1]
-                if y - 1 in boundY:
-                    total += self.array[y][x] * self.array[y - 1][x]
-                if y + 1 in boundY:
-                    total += self.array[y][x] * self.array[y + 1][x]
-                tempArray[y][x] = total
-        return tempArray
+        return heuristics.SumProductOfFourAdjacentTiles(self.array)
 
     def SumProductOfTwoAdjacentTiles(self) -> np.array:
         """
@@ -273,19 +476,7 @@ class GameState:
             np.array of the resulting values.
         """
         
-        sizeY, sizeX = self.array.shape
-        tempArray = np.zeros((sizeY, sizeX))
-        boundY = range(sizeY)
-        boundX = range(sizeX)
-        for y in boundY:
-            for x in boundX:
-                total = 0
-                if x - 1 in boundX:
-                    total += self.array[y][x] * self.array[y][x - 1]
-                if y - 1 in boundY:
-                    total += self.array[y][x] * self.array[y - 1][x]
-                tempArray[y][x] = total
-        return tempArray
+        return heuristics.SumProductOfTwoAdjacentTiles(self.array)
     
     def SumProductOfFourAdjacentTilesWithBounds(self) -> np.array:
         """
@@ -296,31 +487,7 @@ class GameState:
             np.array of the resulting values.
         """
         
-        sizeY, sizeX = self.array.shape
-        tempArray = np.zeros((sizeY, sizeX))
-        boundY = range(sizeY)
-        boundX = range(sizeX)
-        for y in boundY:
-            for x in boundX:
-                total = 0
-                if x - 1 in boundX:
-                    total += self.array[y][x] * self.array[y][x - 1]
-                else:
-                    total += self.array[y][x] ** 2
-                if x + 1 in boundX:
-                    total += self.array[y][x] * self.array[y][x + 1]
-                else:
-                    total += self.array[y][x] ** 2
-                if y - 1 in boundY:
-                    total += self.array[y][x] * self.array[y - 1][x]
-                else:
-                    total += self.array[y][x] ** 2
-                if y + 1 in boundY:
-                    total += self.array[y][x] * self.array[y + 1][x]
-                else:
-                    total += self.array[y][x] ** 2
-                tempArray[y][x] = total
-        return tempArray
+        return heuristics.SumProductOfFourAdjacentTilesWithBounds(self.array)
 
     def DifferenceInLog2(self) -> np.array:
         """
@@ -330,34 +497,141 @@ class GameState:
             np.array of the resulting value.
         """
 
-        sizeY, sizeX = self.array.shape
-        tempArray = np.zeros((sizeY, sizeX))
-        boundY = range(sizeY)
-        boundX = range(sizeX)
-        for y in boundY:
-            for x in boundX:
-                if self.array[y][x] == 0: continue
-                total = 0
-                if x - 1 in boundX:
-                    if self.array[y][x - 1] != 0:
-                        total += abs(math.log2(self.array[y][x]) - math.log2(self.array[y][x - 1]))
-                    else:
-                        total += math.log2(self.array[y][x])
-                if x + 1 in boundX: 
-                    if self.array[y][x + 1] != 0:
-                        total += abs(math.log2(self.array[y][x]) - math.log2(self.array[y][x + 1]))
-                    else:
-                        total += math.log2(self.array[y][x])
-                if y - 1 in boundY:
-                    if self.array[y - 1][x] != 0:
-                        total += abs(math.log2(self.array[y][x]) - math.log2(self.array[y - 1][x]))
-                    else:
-                        total += math.log2(self.array[y][x])
-                if y + 1 in boundY:
-                    if self.array[y + 1][x] != 0:
-                        total += abs(math.log2(self.array[y][x]) - math.log2(self.array[y + 1][x]))
-                    else:
-                        total += math.log2(self.array[y][x])
-                tempArray[y][x] = total
-        return tempArray
+        return heuristics.DifferenceInLog2(self.array)
+
+
+def ScoreStates(states: list, table: TranspositionTable = None) -> None:
+    """
+    Scores a list of game states with a single batched heuristic call.
+
+    Args:
+        states: The game states to score. States which already have a score are skipped.
+        table: A table of known scores keyed by board. Found scores are reused and new
+            scores are added to it.
+    """
+
+    stats = searchstats.ACTIVE
+    startTime = time.perf_counter()
+    unscored = []
+    seen = set()
+    for state in states:
+        # Shared states can appear more than once.
+        if state.HasScore() or id(state) in seen: continue
+        seen.add(id(state))
+        if table is not None:
+            score = table.Get(state.GetKey(table))
+            if score is not None:
+                state.score = score
+                continue
+        unscored.append(state)
+    if not unscored:
+        stats.scoringTime += time.perf_counter() - startTime
+        return
+    heuristic = unscored[0].heuristic
+    if all(state.engine is bitboard for state in unscored):
+        # Packed 4x4 boards are scored with the heuristic's row table.
+        if len(unscored) < 32:
+            scores = [heuristics.ScorePackedBoard(state.board, heuristic) for state in unscored]
+        else:
+            boards = np.array([state.board for state in unscored], dtype=np.uint64)
+            scores = heuristics.ScorePackedBoards(boards, heuristic)
+    else:
+        scores = heuristics.ScoreBoards(np.stack([state.array for state in unscored]), heuristic)
+    for state, score in zip(unscored, scores):
+        state.score = score
+        if table is not None:
+            table.Put(state.GetKey(table), score)
+    stats.nodesScored += len(unscored)
+    stats.scoringTime += time.perf_counter() - startTime
+
+def MoveBoards(arrays: np.ndarray, move: int) -> tuple:
+    """
+    Performs the same move on a stack of boards at once.
+
+    Args:
+        arrays: np.array of shape (N, H, W) of tile values.
+        move: integer representing the move.
+            0 - Up,
+            1 - Right,
+            2 - Down,
+            3 - Left
+
+    Returns:
+        np.array of shape (N, H, W) of the boards after the move.
+        np.array of shape (N,) which is True where the move changed the board.
+        np.array of shape (N,) of the score gained by combining tiles.
+    """
+
+    if move not in (0, 1, 2, 3):
+        raise ValueError(f"Invalid move: {move}")
+    arrays = np.asarray(arrays, dtype=np.int64)
+    if arrays.ndim != 3:
+        raise ValueError(f"Expected an (N, H, W) array of boards, got shape {arrays.shape}.")
+    if arrays.shape[1:] == (4, 4) and arrays.max(initial=0) < 2 ** bitboard.MAX_EXPONENT:
+        boards = bitboard.EncodeBoards(arrays)
+        movedBoards, scores = bitboard.MoveBoards(boards, move)
+        return bitboard.DecodeBoards(movedBoards), movedBoards != boards, scores
+    movedArrays, scores = MoveBoardsLeft(OrientBoards(arrays, move))
+    movedArrays = OrientBoards(movedArrays, move)
+    changed = np.any(movedArrays != arrays, axis=(1, 2))
+    return movedArrays, changed, scores
+
+def OrientBoards(arrays: np.ndarray, move: int) -> np.ndarray:
+    """
+    Flips and transposes a stack of boards so the given move becomes a move to the left.
+    Applying it a second time restores the original orientation.
+
+    Args:
+        arrays: np.array of shape (N, H, W) of tile values.
+        move: integer representing the move.
+
+    Returns:
+        np.array of the reoriented boards.
+    """
+
+    if move == 0:
+        return arrays.transpose(0, 2, 1)
+    if move == 1:
+        return arrays[:, :, ::-1]
+    if move == 2:
+        # Reflecting across the anti-diagonal turns columns into rows read from the bottom.
+        return arrays[:, ::-1, ::-1].transpose(0, 2, 1)
+    return arrays
+
+def MoveBoardsLeft(arrays: np.ndarray) -> tuple:
+    """
+    Slides and combines the tiles of a stack of boards to the left.
+
+    Args:
+        arrays: np.array of shape (N, H, W) of tile values.
+
+    Returns:
+        np.array of shape (N, H, W) of the boards after the move.
+        np.array of shape (N,) of the score gained by combining tiles.
+    """
+
+    count, height, width = arrays.shape
+    rows = CompressRows(arrays.reshape(count * height, width))
+    rowScores = np.zeros(count * height, dtype=np.int64)
+    # Combine neighboring pairs from the left; the emptied tile stops a second combination.
+    for x in range(width - 1):
+        combine = (rows[:, x] == rows[:, x + 1]) & (rows[:, x] != 0)
+        rows[combine, x] *= 2
+        rows[combine, x + 1] = 0
+        rowScores[combine] += rows[combine, x]
+    rows = CompressRows(rows)
+    return rows.reshape(count, height, width), rowScores.reshape(count, height).sum(axis=1)
+
+def CompressRows(rows: np.ndarray) -> np.ndarray:
+    """
+    Slides the non-empty tiles of each row to the left, keeping their order.
+
+    Args:
+        rows: np.array of shape (M, W) of tile values.
+
+    Returns:
+        np.array of shape (M, W) of the compressed rows.
+    """
 
+    order = np.argsort(rows == 0, axis=1, kind='stable')
+    return np.take_along_axis(rows, order, axis=1)
@@ -10,6 +10,7 @@ Description:
 
 import csv
 import json
+import os
 import numpy as np
 
 def AppendColorFile(filepath: str, color: dict) -> None:
@@ -159,7 +160,42 @@ def RecordData( filepath: str, data: dict) -> bool:
         print("CSV File error occured.")
         return False
 
+def AppendRecordData(filepath: str, data: dict) -> bool:
+    """
+    Appends a row to a CSV file, writing the headers first if the file is new or empty.
+    The file is flushed after the row so rows can be read while more are being written.
+    A file written with other headers, such as by RecordData, is rewritten with these
+    headers first.
+    
+    Args:
+        filepath: (str) The file path to the csv file.
+        data: (dict) The data to be stored in the csv.
+        
+    Returns:
+        True if the data was successfully stored to the CSV.
+    """
 
+    headers = ['test no.', 'score', 'highest value', 'total moves', 'seed']
+    try:
+        if os.path.exists(filepath):
+            with open(filepath, newline='') as inputFile:
+                reader = csv.DictReader(inputFile)
+                rows = list(reader) if reader.fieldnames not in (None, headers) else None
+            if rows is not None:
+                with open(filepath, 'w', newline='') as output:
+                    outputDictWriter = csv.DictWriter(output, headers, extrasaction='ignore')
+                    outputDictWriter.writeheader()
+                    outputDictWriter.writerows(rows)
+        with open(filepath, 'a', newline='') as output:
+            outputDictWriter = csv.DictWriter(output, headers, extrasaction='ignore')
+            if output.tell() == 0:
+                outputDictWriter.writeheader()
+            outputDictWriter.writerow(data)
+            output.flush()
+        return True
+    except ValueError:
+        print("CSV File error occured.")
+        return False
 
 
 
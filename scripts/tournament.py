@@ -0,0 +1,131 @@
+"""
+Description:
+    - Plays many seeded headless games across a pool of processes with one agent configuration.
+    - Appends the score, highest tile and move count of each game to the record file as
+      soon as the game finishes.
+
+Usage:
+    python scripts/tournament.py config/appsettings.json --games 100 --maxdepth 3
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from heuristics import LoadRowTables
+from gridboard import SetCacheDirectory
+from simulator import PlayHeadlessGame
+from streamio import ReadConfigFile, AppendRecordData
+
+
+def InitialiseWorker(config: dict) -> None:
+    """
+    Loads the heuristic and move tables in a worker process. The parent has already
+    built any missing tables and saved them to the cache file.
+
+    Args:
+        config: The configuration dict.
+    """
+
+    logging.disable(logging.INFO)
+    LoadRowTables(config['heuristictables'], save=False)
+    SetCacheDirectory(config['rowtables'])
+
+def PlayTournamentGame(config: dict, testNumber: int, seed: int) -> dict:
+    """
+    Plays one headless game in a worker process.
+
+    Args:
+        config: The configuration dict.
+        testNumber: The number of the game in the tournament.
+        seed: The seed of the tile spawns.
+
+    Returns:
+        A dict of the record data of the game.
+    """
+
+    # Sessions are named by the second they start, so games finishing together would share a file.
+    data = PlayHeadlessGame(dict(config, recordsession=False), seed)
+    data['test no.'] = testNumber
+    data['seed'] = seed
+    return data
+
+def RunTournament(config: dict, games: int, workers: int, seed: int, recordFile: str) -> list:
+    """
+    Plays seeded games across a process pool, recording each game as it finishes.
+
+    Args:
+        config: The configuration dict.
+        games: The number of games to play.
+        workers: The number of worker processes.
+        seed: The seed of the first game. Game n is seeded with seed + n - 1.
+        recordFile: The filepath to the csv file the games are appended to.
+
+    Returns:
+        The list of the record data of every game, in the order they finished.
+    """
+
+    # Each game is searched in a single process so the games scale across the cores.
+    config = dict(config, workers=0)
+    # Build and save any missing tables once, rather than in every worker at once.
+    LoadRowTables(config['heuristictables'])
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=InitialiseWorker, initargs=(config,)) as executor:
+        futures = [
+            executor.submit(PlayTournamentGame, config, testNumber, seed + testNumber - 1)
+            for testNumber in range(1, games + 1)
+        ]
+        for future in as_completed(futures):
+            data = future.result()
+            AppendRecordData(recordFile, data)
+            logging.info(
+                f"Game {data['test no.']} (seed {data['seed']}): score {data['score']}, "
+                f"highest tile {data['highest value']}, {data['total moves']} moves."
+            )
+            results.append(data)
+    return results
+
+def GetArguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Returns:
+        The parsed arguments.
+    """
+
+    parser = argparse.ArgumentParser(description="Plays seeded headless games in parallel and records the results.")
+    parser.add_argument('config', help="The filepath to the config file.")
+    parser.add_argument('--games', type=int, default=100, help="The number of games to play.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="The number of worker processes.")
+    parser.add_argument('--seed', type=int, default=0, help="The seed of the first game.")
+    parser.add_argument('--maxdepth', type=int, help="Overrides the search depth in the config file.")
+    parser.add_argument('--heuristic', help="Overrides the heuristic in the config file.")
+    parser.add_argument('--recordfile', help="Overrides the record file in the config file.")
+    return parser.parse_args()
+
+def main():
+    arguments = GetArguments()
+    config = ReadConfigFile(arguments.config)
+    if arguments.maxdepth is not None: config['maxdepth'] = arguments.maxdepth
+    if arguments.heuristic is not None: config['heuristic'] = arguments.heuristic
+    recordFile = arguments.recordfile or config['recordfile']
+
+    startTime = time.perf_counter()
+    results = RunTournament(config, arguments.games, arguments.workers, arguments.seed, recordFile)
+    elapsedTime = time.perf_counter() - startTime
+    if not results: return
+    scores = [data['score'] for data in results]
+    highestTiles = [data['highest value'] for data in results]
+    totalMoves = sum(data['total moves'] for data in results)
+    print(f"Played {len(results)} games in {elapsedTime:.1f}s ({totalMoves / elapsedTime:.0f} moves/s).")
+    print(f"Mean score: {sum(scores) / len(scores):.1f}, best score: {max(scores)}")
+    for tile in sorted(set(highestTiles), reverse=True):
+        print(f"Highest tile {tile}: {highestTiles.count(tile)} games")
+
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    main()